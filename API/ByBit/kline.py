@@ -1,19 +1,26 @@
-from typing import List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
 
+import numpy as np
 from pybit.unified_trading import HTTP
 
+from API.ByBit.session import get_session, rate_limiter
+from app.core.features import KlineFeatures
+from app.core.frame import CandleFrame
+from app.core.store import CandleStore
 from app.entrypoints.schemas.kline import KlineSchema, CandleSchema
 from conf.settings import settings
 from utils.time import ms_to_dt
 
 
-def list_to_schema(
+def frame_to_schema(
         interval,
         symbol,
-        data,
+        frame: CandleFrame,
 ):
     """
-    Преобразовать список свечей в список схем
+    Преобразовать колоночные свечи в список схем
     """
     return [
         KlineSchema(
@@ -22,30 +29,46 @@ def list_to_schema(
             interval=interval,
             data=[
                 CandleSchema(
-                    start=k[0],
-                    end=k[0],
+                    start=int(frame.start[i]),
+                    end=int(frame.start[i]),
                     interval=interval,
-                    open=k[1],
-                    close=k[4],
-                    high=k[2],
-                    low=k[3],
-                    volume=k[5],
-                    turnover=k[6],
+                    open=repr(float(frame.open[i])),
+                    close=repr(float(frame.close[i])),
+                    high=repr(float(frame.high[i])),
+                    low=repr(float(frame.low[i])),
+                    volume=repr(float(frame.volume[i])),
+                    turnover=repr(float(frame.turnover[i])),
                     confirm=True,
                 )
             ],
         )
-        for k in reversed(data)
+        for i in range(len(frame))
     ]
 
+_page_executor = ThreadPoolExecutor(
+    max_workers=settings.KLINES_PAGE_WORKERS,
+    thread_name_prefix='klines-page',
+)
+
+
+def find_gaps(frame: CandleFrame, interval: int) -> List[Tuple[int, int]]:
+    """
+    Найти разрывы в истории.
+    Возвращает пары (start последней свечи перед разрывом, start первой после)
+    """
+    idx = np.flatnonzero(np.diff(frame.start) != interval * 60_000)
+    return [(int(frame.start[i]), int(frame.start[i + 1])) for i in idx]
+
+
 class _KlinesBase:
     max_length: int
-    history: List[KlineSchema]
+    frame: CandleFrame
     interval: int
     start: int
     end: int
     symbol: str
     length: int
+    gaps: List[Tuple[int, int]]
 
     last_kline: CandleSchema
 
@@ -56,6 +79,8 @@ class _KlinesBase:
             start: int,
             end: int = None,
             max_length: int = 1000,
+            session: HTTP = None,
+            use_store: bool = None,
     ):
         self.max_length = max_length
         self.symbol = symbol
@@ -65,16 +90,84 @@ class _KlinesBase:
 
         if settings.PRINT_INFO:
             print(f'[{symbol} {interval}] Загрузка актуальных данный')
-        self.history = self._get_history(
-            symbol=symbol,
-            interval=interval,
-            start=start,
-            end=end,
-        )
+        if use_store is None:
+            use_store = settings.KLINES_USE_STORE
+        if use_store and end is None:
+            self.frame = self._sync_store(
+                symbol=symbol,
+                interval=interval,
+                start=start,
+                max_length=max_length,
+                session=session,
+            )
+        else:
+            self.frame = self._get_history(
+                symbol=symbol,
+                interval=interval,
+                start=start,
+                end=end,
+                max_length=max_length,
+                session=session,
+            )
         if settings.PRINT_INFO:
-            print(f'[{symbol} {interval}] История загружена [{len(self.history)} свечей]')
-        self.length = len(self.history)
-        self.last_kline = self.history[-1].data[0]
+            print(f'[{symbol} {interval}] История загружена [{len(self.frame)} свечей]')
+        self._set_frame(self.frame)
+
+    @classmethod
+    def from_frame(
+            cls,
+            symbol: str,
+            interval: int,
+            frame: CandleFrame,
+    ):
+        """
+        Создать из уже загруженных свечей, без запроса к бирже
+        """
+        klines = cls.__new__(cls)
+        klines.max_length = len(frame)
+        klines.symbol = symbol
+        klines.interval = interval
+        klines.start = int(frame.start[0])
+        klines.end = None
+        klines._set_frame(frame)
+        return klines
+
+    def _set_frame(self, frame: CandleFrame):
+        self.frame = frame
+        self.gaps = find_gaps(frame, self.interval)
+        if self.gaps and settings.PRINT_INFO:
+            print(f'[{self.symbol} {self.interval}] Разрывы в истории: {len(self.gaps)}')
+        self.length = len(frame)
+        self._history = None
+        self._features = None
+        self.last_kline = frame_to_schema(
+            interval=self.interval,
+            symbol=self.symbol,
+            frame=frame[-1:],
+        )[0].data[0]
+
+    @property
+    def history(self) -> List[KlineSchema]:
+        """
+        Свечи в виде схем. Строятся из frame при первом обращении
+        """
+        if self._history is None:
+            self._history = frame_to_schema(
+                interval=self.interval,
+                symbol=self.symbol,
+                frame=self.frame,
+            )
+        return self._history
+
+    @property
+    def features(self) -> KlineFeatures:
+        """
+        Кэш производных массивов и индикаторов текущих свечей.
+        Пересоздается, если frame заменен
+        """
+        if self._features is None or self._features.frame is not self.frame:
+            self._features = KlineFeatures(self.frame)
+        return self._features
 
     @property
     def start_str(self) -> str:
@@ -90,23 +183,24 @@ class _KlinesBase:
         Возвращает end в формате: timestamp | дата-время
         """
         if self.end is None:
-            return self.history[-1].data[0].start_str
+            return self.last_kline.start_str
         dt = ms_to_dt(self.end)
         return f"{self.end} | {dt}"
 
 
     @staticmethod
-    def _get_history(
+    def _get_page(
+            session: HTTP,
             symbol: str,
             interval: int,
             start: int,
-            end: int = None,
-            limit: int = 1000,
-    ) -> List[KlineSchema]:
+            end: int,
+            limit: int,
+    ) -> CandleFrame:
         """
-        Возвращает список свечей в порядке старая -> новая
+        Одна страница свечей (не больше limit)
         """
-        session = HTTP(testnet=settings.TEST_NET)
+        rate_limiter.acquire()
         response = session.get_kline(
             category=settings.CATEGORY_KLINE,
             symbol=symbol,
@@ -118,11 +212,108 @@ class _KlinesBase:
 
         klines = response.get("result", {}).get("list", [])
 
-        return list_to_schema(
-            interval=interval,
+        return CandleFrame.from_bybit(klines)
+
+    @staticmethod
+    def _get_history(
+            symbol: str,
+            interval: int,
+            start: int,
+            end: int = None,
+            limit: int = 1000,
+            max_length: int = 1000,
+            session: HTTP = None,
+    ) -> CandleFrame:
+        """
+        Возвращает свечи в порядке старая -> новая.
+        Диапазон start -> end разбивается на страницы по limit свечей,
+        страницы загружаются параллельно. В результат попадают
+        не больше max_length последних свечей диапазона
+        """
+        if session is None:
+            session = get_session()
+
+        step = interval * 60_000
+        if end is None:
+            end = int(time.time() * 1000)
+        last_start = end // step * step
+        # Выравниваем на границу свечи, чтобы страницы не теряли свечи на стыках
+        start = max(-(-start // step) * step, last_start - (max_length - 1) * step)
+
+        pages = [
+            (page_start, min(page_start + (limit - 1) * step, end))
+            for page_start in range(start, last_start + 1, limit * step)
+        ]
+        if len(pages) <= 1:
+            frame = _KlinesBase._get_page(session, symbol, interval, start, end, limit)
+        else:
+            frames = _page_executor.map(
+                lambda page: _KlinesBase._get_page(session, symbol, interval, page[0], page[1], limit),
+                pages,
+            )
+            frame = CandleFrame.concat(list(frames))
+
+        # Страницы могут пересекаться на границах
+        _, idx = np.unique(frame.start, return_index=True)
+        frame = frame[idx]
+        frame = frame[(frame.start >= start) & (frame.start <= end)]
+        return frame[-max_length:]
+
+    @staticmethod
+    def _sync_store(
+            symbol: str,
+            interval: int,
+            start: int,
+            max_length: int = 1000,
+            session: HTTP = None,
+    ) -> CandleFrame:
+        """
+        Свечи из локального хранилища с догрузкой только новых свечей.
+        Закрытые свечи дописываются в хранилище, незакрытая только добавляется к ответу.
+        Незакрытой всегда считается самая новая свеча из ответа биржи:
+        по локальным часам ее не определить, если они спешат
+        """
+        store = CandleStore(
             symbol=symbol,
-            data=klines
+            category=settings.CATEGORY_KLINE,
+            interval=interval,
         )
+        step = interval * 60_000
+        now = int(time.time() * 1000)
+        last_start = now // step * step
+        start = max(-(-start // step) * step, last_start - (max_length - 1) * step)
+
+        with store.lock:
+            stored = store.load()
+            if len(stored) and stored.start[0] <= start and stored.start[-1] >= start - step:
+                fetch_from = int(stored.start[-1]) + step
+            else:
+                # Хранилище пустое, устарело или не покрывает начало диапазона
+                store.reset()
+                fetch_from = start
+
+            fresh = _KlinesBase._get_history(
+                symbol=symbol,
+                interval=interval,
+                start=fetch_from,
+                end=now,
+                max_length=max((last_start - fetch_from) // step + 1, 1),
+                session=session,
+            )
+            # Если последняя свеча на самом деле закрыта, она допишется
+            # при следующей синхронизации, когда биржа отдаст следующую
+            store.append(fresh[:-1])
+            tail = fresh[-1:]
+            stored = store.load()
+
+        window = stored[np.searchsorted(stored.start, start):]
+        if not len(tail):
+            return window[-max_length:]
+        # Склейка с незакрытой свечой - осознанная копия: start выше ограничен
+        # последними max_length свечами, поэтому копируется только окно,
+        # а не все хранилище
+        return CandleFrame.concat([window, tail])[-max_length:]
+
 
 class Klines(_KlinesBase):
     """"""
\ No newline at end of file
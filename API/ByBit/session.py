@@ -0,0 +1,55 @@
+import threading
+import time
+
+from pybit.unified_trading import HTTP
+
+from conf.settings import settings
+
+_session: HTTP = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> HTTP:
+    """
+    Общая HTTP сессия Bybit.
+    Внутри pybit держит requests.Session, поэтому соединение
+    переиспользуется (keep-alive) между запросами и потоками
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = HTTP(
+                    testnet=settings.TEST_NET,
+                    timeout=settings.KLINES_HTTP_TIMEOUT,
+                )
+    return _session
+
+
+class RateLimiter:
+    """
+    Ограничение частоты запросов (token bucket).
+    Потокобезопасен, общий для всех загрузок свечей
+    """
+
+    def __init__(self, rate: float, burst: int = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+
+
+rate_limiter = RateLimiter(rate=settings.KLINES_RATE_LIMIT)
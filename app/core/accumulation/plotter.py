@@ -1,40 +1,44 @@
-import numpy as np
-from matplotlib import pyplot as plt, patches
-import matplotlib.dates as mdates
-from io import BytesIO
+from app.core.accumulation.zones import zone_stats_to_dicts
+from app.core.render import render_zones
+from app.core.timeframes import map_timeframes, timeframe_label
+from conf.settings import settings
 
-from app.core.accumulation.zones import find_accumulation_and_distribution, calculate_zone_stats
-from utils.time import ms_to_dt_obj
-
-def plot_market_and_report(kline_1, kline_15, kline_30, kline_60, window_size=20, forecast_multiplier=0.5):
+def _zones_for_timeframe(klines, window_size):
     """
-    Формирует графики зон накопления и распределения, но не выводит их на экран.
-    Возвращает изображение в буфере, текстовый отчет и данные по зонам.
+    Зоны и их статистика по одному таймфрейму
+    """
+    closes = klines.frame.close
+    volumes = klines.frame.volume
+    times = klines.features.times
 
-    Параметры:
-    - kline_1, kline_15, kline_30, kline_60: данные свечей для разных таймфреймов
-    - window_size: размер окна для определения зон
-    - forecast_multiplier: длина прогноза зоны относительно длины самой зоны
+    series = klines.features.zone_series
+    acc_zones, dist_zones = series.find_zones(window_size=window_size)
+    acc_table = series.stats_index.stats(acc_zones)
+    dist_table = series.stats_index.stats(dist_zones)
+    return closes, volumes, times, acc_zones, dist_zones, acc_table, dist_table
+
+
+def zones_report(*klines, window_size=20, forecast_multiplier=0.5):
+    """
+    Зоны, текстовый отчет и данные для графика без отрисовки.
 
     Возвращает:
-    - img_buffer: BytesIO с изображением
+    - panels: числовые данные графика по таймфреймам для render_zones
     - report_lines: список строк с текстовым отчетом
     - all_zones_data: словарь с данными по зонам для каждого таймфрейма
     """
-    timeframes = {"1m": kline_1, "15m": kline_15, "30m": kline_30, "60m": kline_60}
     report_lines = []
     all_zones_data = {}
 
-    fig, axes = plt.subplots(4, 2, figsize=(18, 20), gridspec_kw={'width_ratios':[3,1]})
+    # Расчет зон по таймфреймам параллельно
+    zones = map_timeframes(lambda k: _zones_for_timeframe(k, window_size), klines)
 
-    for i, (tf, klines) in enumerate(timeframes.items()):
-        closes = np.array([float(c.data[0].close) for c in klines.history])
-        volumes = np.array([float(c.data[0].volume) for c in klines.history])
-        times = [ms_to_dt_obj(c.data[0].start) for c in klines.history]
-
-        acc_zones, dist_zones = find_accumulation_and_distribution(klines, window_size=window_size)
-        acc_stats = calculate_zone_stats(closes, volumes, acc_zones)
-        dist_stats = calculate_zone_stats(closes, volumes, dist_zones)
+    panels = []
+    for k, tf_zones in zip(klines, zones):
+        tf = timeframe_label(k.interval)
+        closes, volumes, times, acc_zones, dist_zones, acc_table, dist_table = tf_zones
+        acc_stats = zone_stats_to_dicts(acc_table)
+        dist_stats = zone_stats_to_dicts(dist_table)
 
         all_zones_data[tf] = {
             "accumulation": acc_stats,
@@ -66,65 +70,39 @@ def plot_market_and_report(kline_1, kline_15, kline_30, kline_60, window_size=20
                 f"прогноз конца зоны: {stat['forecast_price']:.2f}"
             )
 
-        # Графики (цена и зоны)
-        ax_price = axes[i,0]
-        ax_vol = axes[i,1]
+        panels.append({
+            "label": tf,
+            "starts": k.frame.start,
+            "closes": closes,
+            "volumes": volumes,
+            "forecast_multiplier": forecast_multiplier,
+            "accumulation": acc_table,
+            "distribution": dist_table,
+            "price_points": settings.CHART_PRICE_POINTS,
+            "volume_bars": settings.CHART_VOLUME_BARS,
+        })
 
-        ax_price.plot(times, closes, color='black', label='Цена')
+    return panels, report_lines, all_zones_data
 
-        for stat, color in zip(acc_stats, ['green']*len(acc_stats)):
-            start, end = stat['start_idx'], stat['end_idx']
-            rect = patches.Rectangle(
-                (mdates.date2num(times[start]), min(closes[start:end])),
-                mdates.date2num(times[end-1]) - mdates.date2num(times[start]),
-                max(closes[start:end]) - min(closes[start:end]),
-                facecolor=color, alpha=0.3
-            )
-            ax_price.add_patch(rect)
-
-            forecast_len = int((end-start) * forecast_multiplier)
-            if end + forecast_len < len(times):
-                ax_price.plot(
-                    times[end:end+forecast_len],
-                    [stat['forecast_price']]*forecast_len,
-                    linestyle='--', color=color, alpha=0.7
-                )
-
-        for stat, color in zip(dist_stats, ['blue']*len(dist_stats)):
-            start, end = stat['start_idx'], stat['end_idx']
-            rect = patches.Rectangle(
-                (mdates.date2num(times[start]), min(closes[start:end])),
-                mdates.date2num(times[end-1]) - mdates.date2num(times[start]),
-                max(closes[start:end]) - min(closes[start:end]),
-                facecolor=color, alpha=0.3
-            )
-            ax_price.add_patch(rect)
-
-            forecast_len = int((end-start) * forecast_multiplier)
-            if end + forecast_len < len(times):
-                ax_price.plot(
-                    times[end:end+forecast_len],
-                    [stat['forecast_price']]*forecast_len,
-                    linestyle='--', color=color, alpha=0.7
-                )
-
-        ax_price.set_title(f'{tf} — Цена + зоны')
-        ax_price.grid(True)
-        ax_price.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
-        ax_price.legend(loc='upper left')
-
-        width = (mdates.date2num(times[1]) - mdates.date2num(times[0])) * 0.8 if len(times) > 1 else 0.0005
-        ax_vol.bar(times, volumes, color='gray', width=width)
-        ax_vol.set_title(f'{tf} — Объемы')
-        ax_vol.grid(True)
-        ax_vol.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
-
-    plt.tight_layout()
-
-    # Сохраняем изображение в буфер
-    img_buffer = BytesIO()
-    fig.savefig(img_buffer, format='png', dpi=150)
-    plt.close(fig)
-    img_buffer.seek(0)
-
-    return img_buffer, report_lines, all_zones_data
+
+def plot_market_and_report(*klines, window_size=20, forecast_multiplier=0.5):
+    """
+    Формирует графики зон накопления и распределения, но не выводит их на экран.
+    Возвращает изображение в буфере, текстовый отчет и данные по зонам.
+
+    Параметры:
+    - klines: данные свечей таймфреймов (по одному Klines на таймфрейм)
+    - window_size: размер окна для определения зон
+    - forecast_multiplier: длина прогноза зоны относительно длины самой зоны
+
+    Возвращает:
+    - img_buffer: BytesIO с изображением
+    - report_lines: список строк с текстовым отчетом
+    - all_zones_data: словарь с данными по зонам для каждого таймфрейма
+    """
+    panels, report_lines, all_zones_data = zones_report(
+        *klines,
+        window_size=window_size,
+        forecast_multiplier=forecast_multiplier,
+    )
+    return render_zones(panels), report_lines, all_zones_data
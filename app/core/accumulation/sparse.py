@@ -0,0 +1,53 @@
+"""
+sparse.py
+
+Разреженная таблица (sparse table) для запросов максимума и минимума
+на отрезке за O(1) и поиска первого превышения порога за O(log n).
+"""
+import numpy as np
+
+
+class SparseTable:
+    """
+    Таблица max/min по отрезкам длины 2^k
+    """
+
+    def __init__(self, values: np.ndarray, op=np.maximum):
+        self.op = op
+        self.length = len(values)
+        self.levels = [np.asarray(values, dtype=np.float64)]
+        k = 1
+        while (1 << k) <= self.length:
+            prev = self.levels[-1]
+            half = 1 << (k - 1)
+            self.levels.append(op(prev[:-half], prev[half:]))
+            k += 1
+
+    def query(self, start, end):
+        """
+        max (или min) values[start:end], start/end - числа или массивы, end > start
+        """
+        start = np.asarray(start)
+        end = np.asarray(end)
+        k = np.log2(end - start).astype(np.int64)
+        if k.ndim == 0:
+            level = self.levels[k]
+            return self.op(level[start], level[end - (1 << k)])
+        result = np.empty(len(start), dtype=np.float64)
+        for level_k in np.unique(k):
+            mask = k == level_k
+            level = self.levels[level_k]
+            result[mask] = self.op(level[start[mask]], level[end[mask] - (1 << level_k)])
+        return result
+
+    def first_greater(self, start: int, threshold: float) -> int:
+        """
+        Первый индекс j >= start, где values[j] > threshold (для таблицы максимумов).
+        Если такого нет - длина массива
+        """
+        position = start
+        for k in range(len(self.levels) - 1, -1, -1):
+            level = self.levels[k]
+            if position < len(level) and level[position] <= threshold:
+                position += 1 << k
+        return min(position, self.length)
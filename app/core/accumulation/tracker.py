@@ -0,0 +1,217 @@
+"""
+tracker.py
+
+Потоковый поиск зон накопления и распределения.
+Обрабатываются только новые закрытые свечи. Зоны до первой открытой зоны
+накопления (ожидающей breakout) больше не меняются. После открытой зоны поиск
+продолжается как в find_accumulation_and_distribution без breakout (шаг на окно);
+если breakout все же случится, найденные после нее зоны отменяются и
+поиск повторяется от breakout.
+
+С avg_volume зоны совпадают с find_accumulation_and_distribution по тем же свечам.
+Без него средний объем считается по всем свечам, полученным к моменту
+проверки окна, а не по всей истории сразу.
+"""
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.accumulation.zones import calculate_zone_stats
+from app.entrypoints.schemas.kline import CandleSchema
+
+ACCUMULATION_OPENED = 'accumulation_opened'
+ACCUMULATION_CLOSED = 'accumulation_closed'
+DISTRIBUTION = 'distribution'
+# Зона, найденная после открытой зоны, отменена ее breakout
+ZONE_CANCELLED = 'zone_cancelled'
+
+
+class ZoneTracker:
+    """
+    Состояние поиска зон: найденные зоны, позиция сканирования
+    и открытые зоны накопления
+    """
+
+    def __init__(self, window_size=20, price_std_threshold=0.005,
+                 volume_multiplier=1.2, breakout_multiplier=1.5, avg_volume: float = None):
+        self.window_size = window_size
+        self.price_std_threshold = price_std_threshold
+        self.volume_multiplier = volume_multiplier
+        self.breakout_multiplier = breakout_multiplier
+        # Опорный средний объем, None - среднее по полученным свечам
+        self.avg_volume = avg_volume
+
+        self.starts: List[int] = []
+        self.closes: List[float] = []
+        self.volumes: List[float] = []
+        self._volume_sum = 0.0
+
+        self.accumulation_zones: List[Tuple[int, int]] = []
+        self.distribution_zones: List[Tuple[int, int]] = []
+        # Начало окна, которое проверяется следующим
+        self._position = 0
+        # Открытые зоны накопления по порядку: (начало, порог breakout,
+        # индекс следующей проверки, число зон накопления и распределения до нее)
+        self._open: List[Tuple[int, float, int, int, int]] = []
+        self._stats: Dict[Tuple[int, int], dict] = {}
+
+        self.listeners: List[Callable[[dict], None]] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_klines(cls, klines, **params):
+        """
+        Трекер, заполненный закрытыми свечами klines (последняя свеча не закрыта)
+        """
+        tracker = cls(**params)
+        frame = klines.frame[:-1]
+        for start, close, volume in zip(frame.start.tolist(), frame.close.tolist(), frame.volume.tolist()):
+            tracker.push(start, close, volume)
+        return tracker
+
+    def attach(self, feed, interval: int):
+        """
+        Получать закрытые свечи таймфрейма interval из KlineFeed
+        """
+        def listener(candle_interval: int, candle: CandleSchema):
+            if candle_interval == interval:
+                self.update(candle)
+        feed.listeners.append(listener)
+
+    @property
+    def open_zones(self) -> List[Tuple[int, int]]:
+        return [(start, start + self.window_size) for start, *_ in self._open]
+
+    @property
+    def open_zone(self) -> Optional[Tuple[int, int]]:
+        """
+        Первая открытая зона: зоны до нее окончательные
+        """
+        if not self._open:
+            return None
+        start = self._open[0][0]
+        return start, start + self.window_size
+
+    def update(self, candle: CandleSchema) -> List[dict]:
+        if not candle.confirm:
+            return []
+        return self.push(candle.start, float(candle.close), float(candle.volume))
+
+    def push(self, start: int, close: float, volume: float) -> List[dict]:
+        """
+        Добавить закрытую свечу. Возвращает события по зонам
+        """
+        with self._lock:
+            if self.starts and start <= self.starts[-1]:
+                return []
+            self.starts.append(start)
+            self.closes.append(close)
+            self.volumes.append(volume)
+            self._volume_sum += volume
+            events = self._advance()
+
+        for event in events:
+            for listener in self.listeners:
+                listener(event)
+        return events
+
+    def _breakout(self) -> Optional[Tuple[int, int]]:
+        """
+        Продвинуть проверку breakout открытых зон.
+        Возвращает (номер зоны, свеча breakout) для первой пробитой зоны
+        """
+        last = len(self.closes) - 1
+        for k, (start, threshold, check, n_acc, n_dist) in enumerate(self._open):
+            # Изменение цены между свечами check и check+1
+            while check < last:
+                if abs(self.closes[check + 1] - self.closes[check]) > threshold:
+                    return k, check
+                check += 1
+            self._open[k] = (start, threshold, check, n_acc, n_dist)
+        return None
+
+    def _advance(self) -> List[dict]:
+        events = []
+        last = len(self.closes) - 1
+        w = self.window_size
+        while True:
+            found = self._breakout()
+            if found is not None:
+                k, check = found
+                start, _, _, n_acc, n_dist = self._open[k]
+                # Зоны после пробитой найдены в предположении, что breakout не будет
+                for zone in self.accumulation_zones[n_acc + 1:]:
+                    events.append(self._event(ZONE_CANCELLED, zone, zone_type='accumulation'))
+                for zone in self.distribution_zones[n_dist:]:
+                    events.append(self._event(ZONE_CANCELLED, zone, zone_type='distribution'))
+                del self.accumulation_zones[n_acc + 1:]
+                del self.distribution_zones[n_dist:]
+                del self._open[k:]
+
+                zone = (start, check + 1)
+                self.distribution_zones.append(zone)
+                self._position = check + 1
+                events.append(self._event(ACCUMULATION_CLOSED, (start, start + w)))
+                events.append(self._event(DISTRIBUTION, zone))
+                continue
+
+            # Окно проверяется, когда после него есть хотя бы одна свеча
+            if self._position + w > last:
+                return events
+            i = self._position
+            window = np.array(self.closes[i:i + w])
+            std = np.std(window)
+            avg_volume = self.avg_volume
+            if avg_volume is None:
+                avg_volume = self._volume_sum / len(self.volumes)
+            mean_vol = np.mean(self.volumes[i:i + w])
+            if std / np.mean(window) < self.price_std_threshold and mean_vol > avg_volume * self.volume_multiplier:
+                zone = (i, i + w)
+                self._open.append((
+                    i, std * self.breakout_multiplier, i + w,
+                    len(self.accumulation_zones), len(self.distribution_zones),
+                ))
+                self.accumulation_zones.append(zone)
+                # Пока breakout нет, поиск идет дальше с шагом на окно
+                self._position = i + w
+                events.append(self._event(ACCUMULATION_OPENED, zone))
+            else:
+                self._position += 1
+
+    def _event(self, kind: str, zone: Tuple[int, int], **extra) -> dict:
+        return {
+            "type": kind,
+            "start_idx": zone[0],
+            "end_idx": zone[1],
+            "start": self.starts[zone[0]],
+            "end": self.starts[zone[1] - 1],
+            **extra,
+        }
+
+    def zone_stats(self, zone: Tuple[int, int]) -> dict:
+        """
+        Статистика зоны (calculate_zone_stats), кэшируется по границам:
+        свечи зоны уже закрыты и не меняются
+        """
+        stats = self._stats.get(zone)
+        if stats is None:
+            start, end = zone
+            stats = calculate_zone_stats(
+                np.array(self.closes[start:end]),
+                np.array(self.volumes[start:end]),
+                [(0, end - start)],
+            )[0]
+            stats.update(start_idx=start, end_idx=end)
+            self._stats[zone] = stats
+        return stats
+
+    def stats(self):
+        """
+        Статистика всех зон накопления и распределения
+        """
+        with self._lock:
+            return (
+                [self.zone_stats(zone) for zone in self.accumulation_zones],
+                [self.zone_stats(zone) for zone in self.distribution_zones],
+            )
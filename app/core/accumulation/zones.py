@@ -5,12 +5,87 @@ zones.py
 Содержит функции для поиска этих зон по историческим свечам и расчета статистики по ним.
 
 Функции:
+- ZoneSeries: предрасчет скользящих статистик ряда для поиска зон.
 - find_accumulation_and_distribution: определяет зоны накопления и распределения.
+- ZoneStatsIndex: статистика сразу для многих зон одного ряда.
 - calculate_zone_stats: вычисляет среднюю цену, суммарный объём и прогнозную цену для каждой зоны.
 """
 
 import numpy as np
 
+from app.core.accumulation.sparse import SparseTable
+from app.core.trend.indicators.rolling import rolling_mean, rolling_std
+
+
+class ZoneSeries:
+    """
+    Предрасчет для поиска зон по одному ряду свечей.
+    Скользящие статистики кэшируются по размеру окна,
+    поэтому повторный поиск с другими порогами не пересчитывает их.
+    """
+
+    def __init__(self, closes: np.ndarray, volumes: np.ndarray):
+        self.closes = closes
+        self.volumes = volumes
+        self.avg_volume = np.mean(volumes)
+        # Модуль изменения цены между соседними свечами и индекс для поиска breakout
+        self.abs_diffs = np.abs(np.diff(closes))
+        self.breakouts = SparseTable(self.abs_diffs)
+        self._windows = {}
+        self._stats_index = None
+
+    @property
+    def stats_index(self) -> 'ZoneStatsIndex':
+        if self._stats_index is None:
+            self._stats_index = ZoneStatsIndex(self.closes, self.volumes)
+        return self._stats_index
+
+    def window_stats(self, window_size: int):
+        """
+        (std цены, относительная std цены, средний объем) для каждого окна [i, i+window_size)
+        """
+        stats = self._windows.get(window_size)
+        if stats is None:
+            std = rolling_std(self.closes, window_size)
+            std_rel = std / rolling_mean(self.closes, window_size)
+            vol_mean = rolling_mean(self.volumes, window_size)
+            stats = self._windows[window_size] = (std, std_rel, vol_mean)
+        return stats
+
+    def find_zones(self, window_size=20, price_std_threshold=0.005,
+                   volume_multiplier=1.2, breakout_multiplier=1.5):
+        """
+        Поиск зон накопления и распределения, параметры как у find_accumulation_and_distribution
+        """
+        accumulation_zones = []
+        distribution_zones = []
+
+        limit = len(self.closes) - window_size
+        if limit <= 0:
+            return accumulation_zones, distribution_zones
+
+        std, std_rel, vol_mean = self.window_stats(window_size)
+        hits = (std_rel[:limit] < price_std_threshold) & (vol_mean[:limit] > self.avg_volume * volume_multiplier)
+        # next_hit[i] - первое окно накопления, начинающееся не раньше i
+        positions = np.where(hits, np.arange(limit), limit)
+        next_hit = np.append(np.minimum.accumulate(positions[::-1])[::-1], limit)
+
+        i = int(next_hit[0])
+        while i < limit:
+            accumulation_zones.append((i, i + window_size))
+
+            # Первое изменение цены после окна, превышающее порог
+            threshold = std[i] * breakout_multiplier
+            breakout = self.breakouts.first_greater(i + window_size, threshold)
+            if breakout < len(self.abs_diffs):
+                distribution_zones.append((i, breakout + 1))
+                i = breakout + 1
+            else:
+                i += window_size
+            i = int(next_hit[min(i, limit)])
+
+        return accumulation_zones, distribution_zones
+
 
 def find_accumulation_and_distribution(klines, window_size=20, price_std_threshold=0.005,
                                        volume_multiplier=1.2, breakout_multiplier=1.5):
@@ -28,37 +103,70 @@ def find_accumulation_and_distribution(klines, window_size=20, price_std_thresho
     - accumulation_zones: список кортежей (start_idx, end_idx) зон накопления
     - distribution_zones: список кортежей (start_idx, end_idx) зон распределения
     """
-    closes = np.array([float(c.data[0].close) for c in klines.history])
-    volumes = np.array([float(c.data[0].volume) for c in klines.history])
-    avg_volume = np.mean(volumes)
-
-    accumulation_zones = []
-    distribution_zones = []
-
-    i = 0
-    while i < len(closes) - window_size:
-        window = closes[i:i+window_size]
-        window_vol = volumes[i:i+window_size]
-        std_price = np.std(window) / np.mean(window)
-        mean_vol = np.mean(window_vol)
-
-        if std_price < price_std_threshold and mean_vol > avg_volume * volume_multiplier:
-            accumulation_zones.append((i, i+window_size))
-
-            # Векторизованный поиск breakout
-            future_prices = closes[i+window_size:]
-            diffs = np.abs(np.diff(future_prices))
-            threshold = np.std(window) * breakout_multiplier
-            breakout_idx = np.where(diffs > threshold)[0]
-            if len(breakout_idx) > 0:
-                distribution_zones.append((i, i+window_size+breakout_idx[0]+1))
-                i += window_size + breakout_idx[0] + 1
-            else:
-                i += window_size
-        else:
-            i += 1
+    return klines.features.zone_series.find_zones(
+        window_size=window_size,
+        price_std_threshold=price_std_threshold,
+        volume_multiplier=volume_multiplier,
+        breakout_multiplier=breakout_multiplier,
+    )
+
+
+ZONE_STATS_DTYPE = np.dtype([
+    ('start_idx', np.int64),
+    ('end_idx', np.int64),
+    ('avg_price', np.float64),
+    ('sum_volume', np.float64),
+    ('forecast_price', np.float64),
+    ('min_price', np.float64),
+    ('max_price', np.float64),
+])
+
+
+class ZoneStatsIndex:
+    """
+    Накопленные суммы цены, объема и цены*объем и таблицы min/max цены:
+    статистика любой зоны за O(1), для всех зон - одним векторным расчетом
+    """
 
-    return accumulation_zones, distribution_zones
+    def __init__(self, closes: np.ndarray, volumes: np.ndarray):
+        closes = np.asarray(closes, dtype=np.float64)
+        volumes = np.asarray(volumes, dtype=np.float64)
+        # Центрирование уменьшает потерю точности в накопленных суммах
+        self.offset = closes.mean() if len(closes) else 0.0
+        c0 = closes - self.offset
+        self.c_close = np.concatenate(([0.0], np.cumsum(c0)))
+        self.c_volume = np.concatenate(([0.0], np.cumsum(volumes)))
+        self.c_close_volume = np.concatenate(([0.0], np.cumsum(c0 * volumes)))
+        self.maximum = SparseTable(closes, op=np.maximum)
+        self.minimum = SparseTable(closes, op=np.minimum)
+
+    def stats(self, zones) -> np.ndarray:
+        """
+        Структурированный массив ZONE_STATS_DTYPE, строка на каждую зону (start_idx, end_idx)
+        """
+        result = np.zeros(len(zones), dtype=ZONE_STATS_DTYPE)
+        if not len(zones):
+            return result
+        bounds = np.asarray(zones, dtype=np.int64).reshape(-1, 2)
+        start, end = bounds[:, 0], bounds[:, 1]
+
+        sum_close = self.c_close[end] - self.c_close[start]
+        sum_volume = self.c_volume[end] - self.c_volume[start]
+        sum_close_volume = self.c_close_volume[end] - self.c_close_volume[start]
+
+        avg = sum_close / (end - start)
+        # avg + sum((c - avg) * v / V) = sum(c * v) / V - цена, взвешенная по объему
+        has_volume = sum_volume > 0
+        forecast = np.where(has_volume, sum_close_volume / np.where(has_volume, sum_volume, 1.0), avg)
+
+        result['start_idx'] = start
+        result['end_idx'] = end
+        result['avg_price'] = avg + self.offset
+        result['sum_volume'] = sum_volume
+        result['forecast_price'] = forecast + self.offset
+        result['min_price'] = self.minimum.query(start, end)
+        result['max_price'] = self.maximum.query(start, end)
+        return result
 
 
 def calculate_zone_stats(closes, volumes, zones):
@@ -77,21 +185,20 @@ def calculate_zone_stats(closes, volumes, zones):
         - sum_volume: суммарный объем зоны
         - forecast_price: прогнозная цена (взвешенное изменение цены внутри зоны)
     """
-    stats = []
-    for start, end in zones:
-        avg_price = np.mean(closes[start:end])
-        sum_volume = np.sum(volumes[start:end])
-        # Прогноз через взвешенное изменение
-        if sum_volume > 0:
-            weight = volumes[start:end] / sum_volume
-            forecast_price = avg_price + np.sum((closes[start:end] - avg_price) * weight)
-        else:
-            forecast_price = avg_price
-        stats.append({
-            "start_idx": start,
-            "end_idx": end,
-            "avg_price": avg_price,
-            "sum_volume": sum_volume,
-            "forecast_price": forecast_price
-        })
-    return stats
+    return zone_stats_to_dicts(ZoneStatsIndex(closes, volumes).stats(zones))
+
+
+def zone_stats_to_dicts(stats: np.ndarray):
+    """
+    Строки ZONE_STATS_DTYPE в формате calculate_zone_stats
+    """
+    return [
+        {
+            "start_idx": int(row['start_idx']),
+            "end_idx": int(row['end_idx']),
+            "avg_price": row['avg_price'],
+            "sum_volume": row['sum_volume'],
+            "forecast_price": row['forecast_price'],
+        }
+        for row in stats
+    ]
@@ -0,0 +1,230 @@
+"""
+backtest.py
+
+Историческая проверка общего сигнала по таймфреймам реестра.
+Сигнал считается на закрытии каждой минутной свечи и использует только
+закрытые к этому моменту свечи старших таймфреймов (без заглядывания вперед).
+Индикаторы считаются скользящими ядрами сразу для всех окон,
+история делится на отрезки, которые считаются в пуле процессов.
+
+Запрет позиций берется из общего тренда: bull - запрет шорта,
+bear - запрет лонга, side - без запрета. Запрет считается верным,
+если через horizon минут цена ушла в сторону тренда.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+from app.core.accumulation.sparse import SparseTable
+from app.core.frame import CandleFrame
+from app.core.resample import resample_frame
+from app.core.sweep import load_history
+from app.core.timeframes import TIMEFRAMES, Timeframe
+from app.core.trend.indicators.rolling import rolling_atr, rolling_linregress, true_range
+from conf.settings import settings
+
+# Порядок как в combine_multitimeframe_analysis: при равенстве весов побеждает первый
+BULL, BEAR, SIDE = 0, 1, 2
+
+SUMMARY_KEYS = (
+    'decisions', 'short_bans', 'long_bans', 'no_bans',
+    'short_ban_hits', 'long_ban_hits', 'short_ban_breaches', 'long_ban_breaches',
+)
+
+
+def _last_extremum(closes: np.ndarray, greater: bool) -> np.ndarray:
+    """
+    Индекс последнего строгого локального экстремума не позже каждой свечи (-1, если его нет).
+    Экстремуму нужны соседи с обеих сторон, как в argrelextrema
+    """
+    middle, left, right = closes[1:-1], closes[:-2], closes[2:]
+    if greater:
+        found = (middle > left) & (middle > right)
+    else:
+        found = (middle < left) & (middle < right)
+    index = np.full(len(closes), -1, dtype=np.int64)
+    index[1:-1] = np.where(found, np.arange(1, len(closes) - 1), -1)
+    return np.maximum.accumulate(index)
+
+
+def window_signals(frame: CandleFrame, window_size: int = 40, slope_threshold: float = 0.5) -> Dict[str, np.ndarray]:
+    """
+    analyze_market_current_trend для каждого окна frame сразу.
+    Элемент i - окно свечей i..i+window_size-1
+
+    Возвращает массивы:
+    - trend: BULL / BEAR / SIDE
+    - strength, reversal_level
+    """
+    closes = frame.close
+    slopes, _, r2s = rolling_linregress(closes, window_size)
+    atrs = rolling_atr(true_range(frame.high, frame.low, closes), window_size)
+
+    trend = np.where(slopes > slope_threshold, BULL, np.where(slopes < -slope_threshold, BEAR, SIDE))
+
+    ends = np.arange(len(slopes)) + window_size - 1
+    close = closes[ends]
+    # Экстремум окна должен иметь обоих соседей внутри окна
+    last_max = _last_extremum(closes, greater=True)[ends - 1]
+    last_min = _last_extremum(closes, greater=False)[ends - 1]
+    has_max = last_max > ends - window_size + 1
+    has_min = last_min > ends - window_size + 1
+    max_value = np.where(has_max, closes[last_max], close)
+    min_value = np.where(has_min, closes[last_min], close)
+
+    nearest = np.where(np.abs(close - max_value) < np.abs(close - min_value), max_value, min_value)
+    reversal = np.select(
+        [trend == BULL, trend == BEAR, has_max & has_min],
+        [min_value - atrs, max_value + atrs, nearest],
+        close,
+    )
+    return {
+        "trend": trend,
+        "strength": r2s,
+        "reversal_level": reversal,
+    }
+
+
+def combined_signals(
+        frame: CandleFrame,
+        timeframes: List[Timeframe] = None,
+        slope_threshold: float = 0.5,
+) -> Dict[str, np.ndarray]:
+    """
+    Общий сигнал (как analyze_trends) на закрытии каждой минутной свечи frame.
+    valid - есть полное окно закрытых свечей на всех таймфреймах
+    """
+    timeframes = timeframes or TIMEFRAMES
+    decision_time = frame.start + 60_000
+    count = len(frame)
+
+    scores = np.zeros((3, count))
+    strength = np.zeros(count)
+    levels = []
+    valid = np.ones(count, dtype=bool)
+    for tf in timeframes:
+        interval, weight, window_size = tf.interval, tf.weight, tf.window_size
+        if interval == 1:
+            bars = frame
+        else:
+            bars, complete = resample_frame(frame, interval)
+            bars = bars[complete]
+        if len(bars) < window_size:
+            valid[:] = False
+            levels.append(np.zeros(count))
+            continue
+        signals = window_signals(bars, window_size, slope_threshold)
+
+        # Последняя свеча таймфрейма, закрытая к моменту решения
+        closed = np.searchsorted(bars.start + interval * 60_000, decision_time, side='right') - 1
+        window = closed - (window_size - 1)
+        valid &= window >= 0
+        window = np.maximum(window, 0)
+
+        trend = signals["trend"][window]
+        for code in (BULL, BEAR, SIDE):
+            scores[code] += weight * (trend == code)
+        strength += weight * signals["strength"][window]
+        levels.append(signals["reversal_level"][window])
+
+    weights = np.array([tf.weight for tf in timeframes], dtype=np.float64)
+    levels = np.array(levels)
+    trend = scores.argmax(axis=0)
+    reversal = np.select(
+        [trend == BULL, trend == BEAR],
+        [levels.min(axis=0), levels.max(axis=0)],
+        weights @ levels / weights.sum(),
+    )
+    return {
+        "trend": trend,
+        "strength": strength / weights.sum(),
+        "reversal_level": reversal,
+        "valid": valid,
+    }
+
+
+def score_signals(frame: CandleFrame, signals: Dict[str, np.ndarray], horizon: int, first: int = 0) -> Dict[str, int]:
+    """
+    Счетчики верных запретов для решений с индексами first.. (нужна цена через horizon минут).
+    breach - цена за horizon минут пересекла уровень разворота против тренда
+    """
+    count = len(frame)
+    index = np.arange(first, count - horizon)
+    index = index[signals["valid"][index]]
+    summary = dict.fromkeys(SUMMARY_KEYS, 0)
+    if not len(index):
+        return summary
+
+    closes = frame.close
+    future_return = closes[index + horizon] - closes[index]
+    trend = signals["trend"][index]
+    level = signals["reversal_level"][index]
+    future_low = SparseTable(frame.low, op=np.minimum).query(index + 1, index + horizon + 1)
+    future_high = SparseTable(frame.high, op=np.maximum).query(index + 1, index + horizon + 1)
+
+    short_ban = trend == BULL
+    long_ban = trend == BEAR
+    summary.update(
+        decisions=len(index),
+        short_bans=int(short_ban.sum()),
+        long_bans=int(long_ban.sum()),
+        no_bans=int((trend == SIDE).sum()),
+        short_ban_hits=int((short_ban & (future_return > 0)).sum()),
+        long_ban_hits=int((long_ban & (future_return < 0)).sum()),
+        short_ban_breaches=int((short_ban & (future_low < level)).sum()),
+        long_ban_breaches=int((long_ban & (future_high > level)).sum()),
+    )
+    return summary
+
+
+def _backtest_shard(frame: CandleFrame, first: int, horizon: int, timeframes: List[Timeframe], slope_threshold: float) -> dict:
+    signals = combined_signals(frame, timeframes=timeframes, slope_threshold=slope_threshold)
+    return score_signals(frame, signals, horizon, first=first)
+
+
+def run_backtest(
+        symbol: str,
+        horizon: int = 60,
+        slope_threshold: float = 0.5,
+        category: str = None,
+        max_length: int = None,
+        shards: int = None,
+        max_workers: int = None,
+) -> dict:
+    """
+    Бэктест общего сигнала по минутной истории symbol из локального хранилища.
+
+    Возвращает:
+    - summary: счетчики и доли верных запретов лонга/шорта
+    - shards: счетчики по отрезкам истории
+    """
+    frame = load_history(symbol, 1, category=category, max_length=max_length)
+    workers = max_workers or settings.BATCH_WORKERS
+    shards = shards or workers
+
+    # Каждому отрезку нужна история для окна старшего таймфрейма и цена через horizon
+    warmup = max((tf.window_size + 1) * tf.interval for tf in TIMEFRAMES)
+    bounds = np.linspace(0, len(frame) - horizon, shards + 1).astype(np.int64)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            if end <= start:
+                continue
+            head = max(start - warmup, 0)
+            # Копия среза: memmap хранилища не передается в процесс
+            part = CandleFrame(*[np.array(getattr(frame, name)[head:end + horizon]) for name in CandleFrame.COLUMNS])
+            futures.append(pool.submit(_backtest_shard, part, int(start - head), horizon, TIMEFRAMES, slope_threshold))
+        shard_results = [future.result() for future in futures]
+
+    summary = {key: sum(r[key] for r in shard_results) for key in SUMMARY_KEYS}
+    for side in ('short', 'long'):
+        bans = summary[f'{side}_bans']
+        summary[f'{side}_ban_hit_rate'] = summary[f'{side}_ban_hits'] / bans if bans else None
+        summary[f'{side}_ban_breach_rate'] = summary[f'{side}_ban_breaches'] / bans if bans else None
+
+    return {
+        "summary": summary,
+        "shards": shard_results,
+    }
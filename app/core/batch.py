@@ -0,0 +1,104 @@
+"""
+batch.py
+
+Пакетный анализ списка инструментов.
+Свечи загружаются в основном процессе через общий слой загрузки
+(одна HTTP сессия, общий лимит запросов, кэш), а расчеты по каждому
+инструменту выполняются в пуле процессов - численная часть упирается в GIL.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List
+
+from API.ByBit.kline import Klines
+from app.core.accumulation.plotter import zones_report
+from app.core.frame import CandleFrame
+from app.core.klines import KlinesFetchError, get_klines
+from app.core.render import render_zones
+from app.core.trend.analysis import analyze_trends
+from app.core.trend.indicators.trend_plot import plot_analysis
+from conf.settings import settings
+
+
+def analyze_symbol(
+        symbol: str,
+        frames: Dict[int, CandleFrame],
+        render: bool = False,
+) -> dict:
+    """
+    Полный анализ одного инструмента по уже загруженным свечам.
+    Выполняется в процессе пула
+    """
+    started = time.perf_counter()
+    klines = [
+        Klines.from_frame(symbol=symbol, interval=interval, frame=frame)
+        for interval, frame in frames.items()
+    ]
+    data_trend = analyze_trends(*klines)
+    # Без render график зон не рисуется: нужны только отчет и данные панелей
+    zone_panels, report_zones, _ = zones_report(*klines)
+
+    result = {
+        "trend": data_trend,
+        "zones": report_zones,
+    }
+    if render:
+        image_trend, _ = plot_analysis(data_trend)
+        result["image_trend"] = image_trend.getvalue()
+        result["image_zones"] = render_zones(zone_panels).getvalue()
+    result["elapsed"] = time.perf_counter() - started
+    return result
+
+
+def analyze_watchlist(
+        symbols: List[str] = None,
+        render: bool = False,
+        max_workers: int = None,
+) -> dict:
+    """
+    Анализ списка инструментов.
+
+    Возвращает:
+    - results: symbol -> результат analyze_symbol
+    - errors: symbol -> текст ошибки
+    - timing: общее время, время загрузки и суммарное время расчетов
+    """
+    if symbols is None:
+        symbols = settings.WATCHLIST
+
+    started = time.perf_counter()
+    fetch_time = 0.0
+    results = {}
+    errors = {}
+
+    with ProcessPoolExecutor(max_workers=max_workers or settings.BATCH_WORKERS) as pool:
+        futures = {}
+        # Пока загружаются следующие инструменты, пул уже считает предыдущие
+        for symbol in symbols:
+            fetch_started = time.perf_counter()
+            try:
+                klines = get_klines(symbol=symbol)
+            except KlinesFetchError as e:
+                errors[symbol] = str(e)
+                continue
+            finally:
+                fetch_time += time.perf_counter() - fetch_started
+            frames = {k.interval: k.frame for k in klines}
+            futures[pool.submit(analyze_symbol, symbol, frames, render)] = symbol
+
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                results[symbol] = future.result()
+            except Exception as e:
+                errors[symbol] = str(e)
+
+    return {
+        "results": results,
+        "errors": errors,
+        "timing": {
+            "total": time.perf_counter() - started,
+            "fetch": fetch_time,
+            "compute": sum(r["elapsed"] for r in results.values()),
+        },
+    }
@@ -0,0 +1,103 @@
+"""
+cache.py
+
+Общий для процесса кэш свечей.
+Ключ - (symbol, interval, глубина истории, start текущей свечи). Запись живет,
+пока не закроется текущая свеча таймфрейма.
+Параллельные запросы одного ключа ждут одну загрузку.
+"""
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Tuple
+
+from API.ByBit.kline import Klines
+
+
+class KlinesCache:
+    """
+    Кэш свечей с истечением по закрытию свечи
+    """
+    hits: int
+    misses: int
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, int, int, int], Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+            self,
+            symbol: str,
+            interval: int,
+            loader: Callable[[], Klines],
+            max_length: int = 0,
+    ) -> Klines:
+        """
+        Свечи из кэша или загрузка через loader.
+        max_length - глубина истории: загрузки разной глубины не подменяют друг друга
+        """
+        now = int(time.time() * 1000)
+        key = self._key(symbol, interval, max_length, now)
+
+        with self._lock:
+            self._evict(now)
+            future = self._entries.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._entries[key] = future
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if owner:
+            try:
+                future.set_result(loader())
+            except Exception as e:
+                future.set_exception(e)
+                with self._lock:
+                    # Ошибку не кэшируем, следующий запрос загрузит заново
+                    if self._entries.get(key) is future:
+                        del self._entries[key]
+        return future.result()
+
+    def drop_pending(self, symbol: str, interval: int, max_length: int = 0):
+        """
+        Забыть незавершенную загрузку, которую не дождались: следующий запрос
+        начнет новую, а не будет ждать зависшую
+        """
+        key = self._key(symbol, interval, max_length, int(time.time() * 1000))
+        with self._lock:
+            future = self._entries.get(key)
+            if future is not None and not future.done():
+                del self._entries[key]
+
+    @staticmethod
+    def _key(symbol: str, interval: int, max_length: int, now: int) -> Tuple[str, int, int, int]:
+        step = interval * 60_000
+        return symbol, interval, max_length, now // step * step
+
+    def _evict(self, now: int):
+        expired = [
+            key for key in self._entries
+            if key[3] + key[1] * 60_000 <= now
+        ]
+        for key in expired:
+            del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+            }
+
+
+klines_cache = KlinesCache()
@@ -0,0 +1,59 @@
+"""
+downsample.py
+
+Прореживание рядов перед отрисовкой под заданное число точек.
+Цена - Largest-Triangle-Three-Buckets (сохраняет форму и экстремумы),
+объемы - максимум по корзинам (пики не теряются).
+"""
+from typing import Tuple
+
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, points: int, keep: np.ndarray = None) -> np.ndarray:
+    """
+    Индексы точек LTTB в порядке возрастания.
+    keep - индексы, которые должны остаться в любом случае (границы зон, экстремумы)
+    """
+    n = len(y)
+    if points >= n or points < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    every = (n - 2) / (points - 2)
+    selected = np.empty(points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(points - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        # Среднее следующей корзины (для последней - последняя точка)
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    if keep is not None and len(keep):
+        selected = np.union1d(selected, np.asarray(keep, dtype=np.int64))
+    return selected
+
+
+def max_buckets(values: np.ndarray, buckets: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Максимум values по buckets равным корзинам.
+    Возвращает (границы корзин [first, last) длины buckets + 1, максимумы)
+    """
+    n = len(values)
+    if buckets >= n or buckets < 1:
+        return np.arange(n + 1), np.asarray(values, dtype=np.float64)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    return edges, np.maximum.reduceat(np.asarray(values, dtype=np.float64), edges[:-1])
@@ -0,0 +1,76 @@
+"""
+features.py
+
+Производные массивы и индикаторы одного набора свечей.
+Считаются при первом обращении и переиспользуются всеми этапами анализа
+(тренд, режим рынка, зоны, графики). Кэш привязан к конкретному CandleFrame:
+при замене свечей в Klines создается новый.
+"""
+import threading
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from app.core.accumulation.zones import ZoneSeries
+from app.core.frame import CandleFrame
+from app.core.trend.indicators.rolling import PrefixSums, rolling_atr, true_range
+from utils.time import ms_to_dt_obj
+
+
+class KlineFeatures:
+    """
+    Мемоизация производных данных свечей
+    """
+    frame: CandleFrame
+
+    def __init__(self, frame: CandleFrame):
+        self.frame = frame
+        self._cache: Dict[tuple, object] = {}
+        self._lock = threading.RLock()
+
+    def _get(self, key: tuple, build: Callable):
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = build()
+            return self._cache[key]
+
+    @property
+    def times(self) -> List:
+        """
+        Время начала свечей (datetime UTC)
+        """
+        return self._get(('times',), lambda: [ms_to_dt_obj(int(start)) for start in self.frame.start])
+
+    @property
+    def true_range(self) -> np.ndarray:
+        return self._get(('true_range',), lambda: true_range(self.frame.high, self.frame.low, self.frame.close))
+
+    @property
+    def price_sums(self) -> PrefixSums:
+        return self._get(('price_sums',), lambda: PrefixSums(self.frame.close))
+
+    @property
+    def tr_sums(self) -> PrefixSums:
+        return self._get(('tr_sums',), lambda: PrefixSums(self.true_range))
+
+    def regression(self, window_size: int):
+        """
+        (slope, intercept, r2) для каждого окна, как rolling_linregress
+        """
+        def build():
+            starts = np.arange(self.price_sums.length - window_size + 1)
+            return self.price_sums.regression(starts, window_size)
+        return self._get(('regression', window_size), build)
+
+    def atr(self, window_size: int) -> np.ndarray:
+        """
+        ATR для каждого окна, как rolling_atr
+        """
+        return self._get(('atr', window_size), lambda: rolling_atr(self.true_range, window_size))
+
+    @property
+    def zone_series(self) -> ZoneSeries:
+        """
+        Предрасчет для поиска зон, сам кэширует статистики по размеру окна
+        """
+        return self._get(('zone_series',), lambda: ZoneSeries(self.frame.close, self.frame.volume))
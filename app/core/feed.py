@@ -0,0 +1,337 @@
+"""
+feed.py
+
+Живой поток свечей через WebSocket Bybit (kline.{interval}.{symbol}).
+Для каждого таймфрейма держится кольцевой буфер последних lookback свечей
+(из реестра таймфреймов): незакрытая свеча обновляется на месте, новая
+дописывается в конец. История при запуске и после переподключения подгружается
+через REST в отдельном потоке уже после подписки: сообщения, пришедшие во время
+загрузки, копятся и применяются поверх истории. Пропуск свечи в потоке
+запускает повторную загрузку таймфрейма. Пока история не загружена, поток
+не считается готовым и get_klines берет свечи через REST.
+"""
+import json
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import websocket
+
+from API.ByBit.kline import Klines
+from app.core.frame import CandleFrame
+from app.core.timeframes import get_timeframe
+from app.entrypoints.schemas.kline import KlineSchema, CandleSchema
+from conf.settings import settings
+
+
+class CandleRing:
+    """
+    Кольцевой буфер последних capacity свечей
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = np.zeros((len(CandleFrame.COLUMNS), capacity), dtype=np.float64)
+        self._head = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def last_start(self) -> Optional[int]:
+        if not self._count:
+            return None
+        return int(self._data[0, (self._head - 1) % self.capacity])
+
+    def update(self, candle: CandleSchema):
+        """
+        Обновить свечу с тем же start или дописать новую
+        """
+        row = [
+            candle.start,
+            float(candle.open),
+            float(candle.high),
+            float(candle.low),
+            float(candle.close),
+            float(candle.volume),
+            float(candle.turnover),
+        ]
+        with self._lock:
+            last_start = self.last_start
+            if last_start is not None and candle.start < last_start:
+                # Запоздавшее сообщение по уже прошедшей свече
+                return
+            if last_start is not None and candle.start == last_start:
+                position = (self._head - 1) % self.capacity
+            else:
+                position = self._head
+                self._head = (self._head + 1) % self.capacity
+                self._count = min(self._count + 1, self.capacity)
+            self._data[:, position] = row
+
+    def reset(self, frame: CandleFrame):
+        """
+        Заполнить буфер историей
+        """
+        frame = frame[-self.capacity:]
+        with self._lock:
+            for i, name in enumerate(CandleFrame.COLUMNS):
+                self._data[i, :len(frame)] = getattr(frame, name)
+            self._count = len(frame)
+            self._head = len(frame) % self.capacity
+
+    def to_frame(self) -> CandleFrame:
+        """
+        Копия свечей в порядке старая -> новая
+        """
+        with self._lock:
+            if self._count < self.capacity:
+                data = self._data[:, :self._count].copy()
+            else:
+                data = np.roll(self._data, -self._head, axis=1)
+        return CandleFrame(*data)
+
+
+class KlineFeed:
+    """
+    Подписка на свечи нескольких таймфреймов одного инструмента
+    """
+    symbol: str
+    intervals: List[int]
+    rings: Dict[int, CandleRing]
+
+    def __init__(
+            self,
+            symbol: str,
+            intervals: List[int],
+            capacity: int = None,
+            url: str = None,
+            seed: bool = True,
+            reconnect_delay: float = 2,
+    ):
+        self.symbol = symbol
+        self.intervals = intervals
+        self.url = url or settings.KLINES_FEED_URL
+        self.seed = seed
+        self.reconnect_delay = reconnect_delay
+        self.rings = {}
+        # Минимум свечей для анализа: окно тренда таймфрейма
+        self.min_length = {}
+        for interval in intervals:
+            tf = get_timeframe(interval)
+            self.rings[interval] = CandleRing(capacity or (tf.lookback if tf else settings.KLINES_FEED_CAPACITY))
+            self.min_length[interval] = tf.window_size if tf else 1
+        # Таймфреймы, для которых после последнего подключения загружена история
+        self._seeded = {interval: False for interval in intervals}
+        # Сообщения, пришедшие во время загрузки истории (None - загрузки нет)
+        self._pending: Dict[int, Optional[List[CandleSchema]]] = {interval: None for interval in intervals}
+        # Номер подключения: загрузка от прошлого подключения не применяется
+        self._generation = 0
+        self._seed_lock = threading.Lock()
+        self.listeners: List[Callable[[int, CandleSchema], None]] = []
+
+        self._ws: Optional[websocket.WebSocketApp] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._subscribed = threading.Event()
+
+    @property
+    def topics(self) -> List[str]:
+        return [f'kline.{interval}.{self.symbol}' for interval in self.intervals]
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name=f'feed-{self.symbol}', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        ws = self._ws
+        sock = ws.sock if ws is not None else None
+        if sock is not None and sock.connected:
+            # run_forever ждет данных в select до ping_timeout: после close frame
+            # abort будит его сразу, иначе поток завершается только по таймауту
+            ws.keep_running = False
+            try:
+                sock.send_close()
+            except websocket.WebSocketException:
+                pass
+            sock.abort()
+        elif ws is not None:
+            ws.close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if sock is not None:
+            sock.shutdown()
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        return self._subscribed.wait(timeout)
+
+    def is_ready(self, interval: int) -> bool:
+        """
+        Подписка активна, история загружена (без seed - буфер заполнен потоком)
+        и свечей хватает на окно анализа
+        """
+        ring = self.rings[interval]
+        complete = self._seeded[interval] if self.seed else len(ring) >= ring.capacity
+        return self._subscribed.is_set() and complete and len(ring) >= self.min_length[interval]
+
+    def get_klines(self, interval: int) -> Optional[Klines]:
+        """
+        Свечи таймфрейма из памяти или None, если поток не готов
+        """
+        if not self.is_ready(interval):
+            return None
+        return Klines.from_frame(
+            symbol=self.symbol,
+            interval=interval,
+            frame=self.rings[interval].to_frame(),
+        )
+
+    def _load_history(self, interval: int) -> CandleFrame:
+        capacity = self.rings[interval].capacity
+        klines = Klines(
+            symbol=self.symbol,
+            interval=interval,
+            start=int(time.time() * 1000) - interval * 60_000 * capacity,
+            max_length=capacity,
+        )
+        return klines.frame
+
+    def _start_seed(self, intervals: List[int]):
+        """
+        Загрузить историю в отдельном потоке, не блокируя чтение WebSocket.
+        Вызывается под _seed_lock
+        """
+        for interval in intervals:
+            self._seeded[interval] = False
+            self._pending[interval] = []
+        threading.Thread(
+            target=self._seed,
+            args=(intervals, self._generation),
+            name=f'feed-seed-{self.symbol}',
+            daemon=True,
+        ).start()
+
+    def _seed(self, intervals: List[int], generation: int):
+        """
+        Подгрузить историю через REST и применить поверх нее накопленные
+        сообщения потока. Таймфрейм с ошибкой загрузки остается неготовым,
+        история, отстающая от потока, загружается заново
+        """
+        for interval in intervals:
+            while True:
+                try:
+                    frame = self._load_history(interval)
+                except Exception as e:
+                    print(f'[{self.symbol}] Ошибка загрузки истории {interval}m для потока: {e}')
+                    frame = None
+                with self._seed_lock:
+                    if generation != self._generation or self._stopped.is_set():
+                        return
+                    pending = self._pending[interval]
+                    stale = (
+                        frame is not None and len(frame) and pending
+                        and pending[0].start > frame.start[-1] + interval * 60_000
+                    )
+                    if not stale:
+                        ring = self.rings[interval]
+                        if frame is not None:
+                            ring.reset(frame)
+                        for candle in pending:
+                            ring.update(candle)
+                        self._pending[interval] = None
+                        self._seeded[interval] = frame is not None
+                        break
+                print(f'[{self.symbol}] История {interval}m отстает от потока, повторная загрузка')
+                time.sleep(self.reconnect_delay)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=self._on_error,
+                on_close=self._on_close,
+            )
+            self._ws.run_forever(ping_interval=20, ping_timeout=10)
+            self._subscribed.clear()
+            if not self._stopped.is_set():
+                time.sleep(self.reconnect_delay)
+
+    def _on_open(self, ws: websocket.WebSocketApp):
+        # После переподключения в буфере пропуск, история загружается заново.
+        # Подписка отправляется до загрузки: свеча, закрывшаяся во время
+        # загрузки, придет в потоке и перезапишет неполную свечу из истории.
+        # Сообщения читаются после выхода из _on_open, поэтому ни одно не потеряется
+        ws.send(json.dumps({"op": "subscribe", "args": self.topics}))
+        with self._seed_lock:
+            self._generation += 1
+            for interval in self.intervals:
+                self._seeded[interval] = False
+            if self.seed:
+                self._start_seed(self.intervals)
+
+    def _on_message(self, ws: websocket.WebSocketApp, message: str):
+        payload = json.loads(message)
+        if payload.get('op') == 'subscribe':
+            if payload.get('success'):
+                self._subscribed.set()
+            else:
+                print(f'[{self.symbol}] Ошибка подписки: {payload.get("ret_msg")}')
+            return
+
+        topic = payload.get('topic', '')
+        if not topic.startswith('kline.'):
+            return
+        _, interval, symbol = topic.split('.', 2)
+        kline = KlineSchema(symbol=symbol, interval=int(interval), **payload)
+        ring = self.rings.get(kline.interval)
+        if ring is None:
+            return
+        step = kline.interval * 60_000
+        for candle in kline.data:
+            with self._seed_lock:
+                pending = self._pending[kline.interval]
+                if pending is not None:
+                    pending.append(candle)
+                elif self._seeded[kline.interval] and len(ring) and candle.start > ring.last_start + step:
+                    # Пропущены свечи: буфер неполный до повторной загрузки
+                    self._start_seed([kline.interval])
+                    self._pending[kline.interval].append(candle)
+                else:
+                    ring.update(candle)
+            for listener in self.listeners:
+                listener(kline.interval, candle)
+
+    def _on_error(self, ws: websocket.WebSocketApp, error: Exception):
+        print(f'[{self.symbol}] Ошибка WebSocket: {error}')
+
+    def _on_close(self, ws: websocket.WebSocketApp, status_code, message):
+        if settings.PRINT_INFO:
+            print(f'[{self.symbol}] WebSocket закрыт: {status_code} {message}')
+
+
+_feed: Optional[KlineFeed] = None
+
+
+def start_feed(symbol: str, intervals: List[int]) -> KlineFeed:
+    """
+    Запустить общий для процесса поток свечей
+    """
+    global _feed
+    if _feed is None:
+        _feed = KlineFeed(symbol=symbol, intervals=intervals)
+        _feed.start()
+    return _feed
+
+
+def get_feed() -> Optional[KlineFeed]:
+    return _feed
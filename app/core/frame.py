@@ -0,0 +1,102 @@
+"""
+frame.py
+
+Колоночное представление свечей.
+Каждое поле свечи хранится отдельным непрерывным массивом numpy,
+чтобы анализаторы работали с массивами напрямую без разбора строк.
+"""
+from typing import List
+
+import numpy as np
+
+
+class CandleFrame:
+    """
+    Свечи в колоночном виде в порядке старая -> новая
+    """
+    start: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+    turnover: np.ndarray
+
+    COLUMNS = ('start', 'open', 'high', 'low', 'close', 'volume', 'turnover')
+
+    def __init__(
+            self,
+            start: np.ndarray,
+            open: np.ndarray,
+            high: np.ndarray,
+            low: np.ndarray,
+            close: np.ndarray,
+            volume: np.ndarray,
+            turnover: np.ndarray,
+    ):
+        self.start = np.ascontiguousarray(start, dtype=np.int64)
+        self.open = np.ascontiguousarray(open, dtype=np.float64)
+        self.high = np.ascontiguousarray(high, dtype=np.float64)
+        self.low = np.ascontiguousarray(low, dtype=np.float64)
+        self.close = np.ascontiguousarray(close, dtype=np.float64)
+        self.volume = np.ascontiguousarray(volume, dtype=np.float64)
+        self.turnover = np.ascontiguousarray(turnover, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    def __getitem__(self, item) -> 'CandleFrame':
+        """
+        Срез или выборка свечей по индексам.
+        Для непрерывных срезов массивы не копируются
+        """
+        if isinstance(item, int):
+            raise TypeError('CandleFrame поддерживает только срезы и массивы индексов')
+        return CandleFrame(
+            start=self.start[item],
+            open=self.open[item],
+            high=self.high[item],
+            low=self.low[item],
+            close=self.close[item],
+            volume=self.volume[item],
+            turnover=self.turnover[item],
+        )
+
+    @classmethod
+    def empty(cls) -> 'CandleFrame':
+        return cls(*[np.empty(0) for _ in range(7)])
+
+    @classmethod
+    def concat(cls, frames: List['CandleFrame']) -> 'CandleFrame':
+        """
+        Склеить несколько наборов свечей в один
+        """
+        frames = [f for f in frames if len(f)]
+        if not frames:
+            return cls.empty()
+        if len(frames) == 1:
+            return frames[0]
+        return cls(*[
+            np.concatenate([getattr(f, name) for f in frames])
+            for name in cls.COLUMNS
+        ])
+
+    @classmethod
+    def from_bybit(cls, data: List[List[str]]) -> 'CandleFrame':
+        """
+        Построить из ответа Bybit get_kline.
+        Bybit отдает строки в порядке новая -> старая:
+        [start, open, high, low, close, volume, turnover]
+        """
+        if not data:
+            return cls.empty()
+        raw = np.array(data, dtype=np.float64)[::-1]
+        return cls(
+            start=raw[:, 0],
+            open=raw[:, 1],
+            high=raw[:, 2],
+            low=raw[:, 3],
+            close=raw[:, 4],
+            volume=raw[:, 5],
+            turnover=raw[:, 6],
+        )
@@ -0,0 +1,96 @@
+"""
+image_encoder.py
+
+Сжатие готовых графиков перед загрузкой в S3 и отправкой в Telegram.
+Форматы: PNG с палитрой (графики почти одноцветные, сжатие без заметных потерь),
+JPEG и WebP с подбором качества. Изображение уменьшается до max_side по длинной
+стороне и, если не укладывается в max_bytes, дальше, пока не уложится. Короткая
+сторона не становится меньше MIN_SIDE: тогда возвращается самый малый вариант,
+даже если он больше max_bytes.
+"""
+from io import BytesIO
+
+from PIL import Image
+
+# формат -> (расширение, Content-Type)
+FORMATS = {
+    'png': ('png', 'image/png'),
+    'jpeg': ('jpg', 'image/jpeg'),
+    'webp': ('webp', 'image/webp'),
+}
+
+
+class ImageEncoder:
+    """
+    Параметры сжатия и кодирование изображения в байты
+    """
+    MAX_QUALITY = 90
+    MIN_QUALITY = 40
+    # Шаг уменьшения, если не уложились в размер, и предел уменьшения
+    SCALE_STEP = 0.75
+    MIN_SIDE = 400
+
+    def __init__(self, image_format: str = 'png', max_bytes: int = 0, max_side: int = 0):
+        if image_format not in FORMATS:
+            raise ValueError(f'Неизвестный формат изображения: {image_format}')
+        self.image_format = image_format
+        self.max_bytes = max_bytes
+        self.max_side = max_side
+
+    def __repr__(self):
+        return f'ImageEncoder({self.image_format!r}, max_bytes={self.max_bytes}, max_side={self.max_side})'
+
+    @property
+    def extension(self) -> str:
+        return FORMATS[self.image_format][0]
+
+    @property
+    def content_type(self) -> str:
+        return FORMATS[self.image_format][1]
+
+    def _save(self, image: Image.Image, quality: int) -> bytes:
+        buf = BytesIO()
+        if self.image_format == 'png':
+            image.quantize(256, method=Image.Quantize.FASTOCTREE).save(buf, format='PNG', optimize=True)
+        elif self.image_format == 'jpeg':
+            image.save(buf, format='JPEG', quality=quality, optimize=True)
+        else:
+            image.save(buf, format='WEBP', quality=quality, method=4)
+        return buf.getvalue()
+
+    def _fit_quality(self, image: Image.Image) -> bytes:
+        """
+        Наибольшее качество, при котором изображение укладывается в max_bytes
+        (для PNG качество не подбирается)
+        """
+        data = self._save(image, self.MAX_QUALITY)
+        if self.image_format == 'png' or not self.max_bytes or len(data) <= self.max_bytes:
+            return data
+
+        low, high = self.MIN_QUALITY, self.MAX_QUALITY - 1
+        best = self._save(image, low)
+        if len(best) > self.max_bytes:
+            return best
+        while low < high:
+            quality = (low + high + 1) // 2
+            candidate = self._save(image, quality)
+            if len(candidate) <= self.max_bytes:
+                low, best = quality, candidate
+            else:
+                high = quality - 1
+        return best
+
+    def encode(self, image: Image.Image) -> bytes:
+        image = image.convert('RGB')
+        if self.max_side and max(image.size) > self.max_side:
+            image.thumbnail((self.max_side, self.max_side), Image.Resampling.LANCZOS)
+
+        while True:
+            data = self._fit_quality(image)
+            if not self.max_bytes or len(data) <= self.max_bytes:
+                return data
+            width, height = image.size
+            size = (int(width * self.SCALE_STEP), int(height * self.SCALE_STEP))
+            if min(size) < self.MIN_SIDE:
+                return data
+            image = image.resize(size, Image.Resampling.LANCZOS)
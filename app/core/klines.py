@@ -1,30 +1,151 @@
 import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+from typing import Dict, List, Tuple
+
 from conf.settings import settings
 from API.ByBit.kline import Klines
+from API.ByBit.session import get_session
+from app.core.cache import klines_cache
+from app.core.feed import get_feed
+from app.core.resample import resample_klines
+from app.core.timeframes import Timeframe, get_timeframe, intervals as timeframe_intervals
 
+_executor = ThreadPoolExecutor(
+    max_workers=settings.KLINES_FETCH_WORKERS,
+    thread_name_prefix='klines',
+)
 
-def get_klines():
-    kline_1 = Klines(
-        symbol=settings.SYMBOL,
-        interval=1,
-        start=int((datetime.datetime.now(datetime.UTC) - datetime.timedelta(minutes=1000)).timestamp() * 1000),
-    )
 
-    klines_15 = Klines(
-        symbol=settings.SYMBOL,
-        interval=15,
-        start=int((datetime.datetime.now(datetime.UTC) - datetime.timedelta(minutes=15000)).timestamp() * 1000),
-    )
+class KlinesFetchError(Exception):
+    """
+    Часть таймфреймов не загрузилась.
+    results - успешно загруженные свечи, errors - ошибки по таймфреймам
+    """
 
-    klines_30 = Klines(
-        symbol=settings.SYMBOL,
-        interval=30,
-        start=int((datetime.datetime.now(datetime.UTC) - datetime.timedelta(minutes=30000)).timestamp() * 1000),
-    )
+    def __init__(self, results: Dict[int, Klines], errors: Dict[int, Exception]):
+        self.results = results
+        self.errors = errors
+        details = ', '.join(f'{interval}: {error!r}' for interval, error in errors.items())
+        super().__init__(f'Не удалось загрузить свечи [{details}]')
+
+
+def fetch_klines(
+        symbol: str,
+        intervals: List[int],
+        timeout: float = None,
+        lookbacks: Dict[int, int] = None,
+) -> Tuple[Dict[int, Klines], Dict[int, Exception]]:
+    """
+    Параллельная загрузка нескольких таймфреймов через одну HTTP сессию.
+    lookbacks - глубина истории в свечах вместо глубины из реестра.
+    Возвращает (успешные свечи, ошибки) по таймфреймам
+    """
+    if timeout is None:
+        timeout = settings.KLINES_FETCH_TIMEOUT
+
+    session = get_session()
+    now = datetime.datetime.now(datetime.UTC)
+    lengths = {
+        interval: (lookbacks or {}).get(interval) or (get_timeframe(interval) or Timeframe(interval, weight=1)).lookback
+        for interval in intervals
+    }
+    loaders = {
+        interval: partial(
+            Klines,
+            symbol=symbol,
+            interval=interval,
+            start=int((now - datetime.timedelta(minutes=interval * length)).timestamp() * 1000),
+            max_length=length,
+            session=session,
+        )
+        for interval, length in lengths.items()
+    }
+    if settings.KLINES_CACHE_ENABLED:
+        futures = {
+            interval: _executor.submit(klines_cache.get, symbol, interval, loader, lengths[interval])
+            for interval, loader in loaders.items()
+        }
+    else:
+        futures = {
+            interval: _executor.submit(loader)
+            for interval, loader in loaders.items()
+        }
+    wait(futures.values(), timeout=timeout)
+
+    results = {}
+    errors = {}
+    for interval, future in futures.items():
+        if not future.done():
+            # cancel снимает только задачу из очереди: начатая загрузка не
+            # прерывается, поэтому ее запись в кэше забывается
+            future.cancel()
+            if settings.KLINES_CACHE_ENABLED:
+                klines_cache.drop_pending(symbol, interval, lengths[interval])
+            errors[interval] = TimeoutError(f'Превышено время ожидания {timeout} сек')
+        elif future.exception() is not None:
+            errors[interval] = future.exception()
+        else:
+            results[interval] = future.result()
+    return results, errors
+
+
+def derive_klines(
+        symbol: str,
+        intervals: List[int],
+        max_length: int = None,
+        timeout: float = None,
+) -> Dict[int, Klines]:
+    """
+    Загрузить только минутные свечи и собрать из них остальные таймфреймы.
+    Без max_length глубина истории каждого таймфрейма берется из реестра.
+    Минутные свечи грузятся через fetch_klines (кэш и таймаут), ошибка
+    загрузки - KlinesFetchError по всем запрошенным таймфреймам
+    """
+    lengths = {
+        interval: max_length or (get_timeframe(interval) or Timeframe(interval, weight=1)).lookback
+        for interval in intervals
+    }
+    minutes = max(interval * length for interval, length in lengths.items())
+    results, errors = fetch_klines(symbol=symbol, intervals=[1], timeout=timeout, lookbacks={1: minutes})
+    if errors:
+        raise KlinesFetchError(results={}, errors={interval: errors[1] for interval in intervals})
+    base = results[1]
+    return {
+        interval: Klines.from_frame(symbol, 1, base.frame[-length:]) if interval == 1
+        else resample_klines(base, interval, max_length=length)
+        for interval, length in lengths.items()
+    }
+
+
+def get_klines(symbol: str = None) -> Tuple[Klines, ...]:
+    """
+    Свечи всех таймфреймов реестра в порядке settings.TIMEFRAMES
+    """
+    if symbol is None:
+        symbol = settings.SYMBOL
+    intervals = timeframe_intervals()
+
+    feed = get_feed()
+    if feed is not None and feed.symbol == symbol:
+        # Поток может стать неготовым между таймфреймами: тогда все свечи из REST
+        streamed = tuple(feed.get_klines(interval) for interval in intervals)
+        if all(klines is not None for klines in streamed):
+            return streamed
+
+    if settings.KLINES_RESAMPLE:
+        results = derive_klines(
+            symbol=symbol,
+            intervals=intervals,
+        )
+        return tuple(results[interval] for interval in intervals)
 
-    klines_60 = Klines(
-        symbol=settings.SYMBOL,
-        interval=60,
-        start=int((datetime.datetime.now(datetime.UTC) - datetime.timedelta(hours=1000)).timestamp() * 1000),
+    results, errors = fetch_klines(
+        symbol=symbol,
+        intervals=intervals,
     )
-    return kline_1, klines_15, klines_30, klines_60
+    if settings.PRINT_INFO and settings.KLINES_CACHE_ENABLED:
+        print(f'[{symbol}] Кэш свечей: {klines_cache.stats()}')
+    if errors:
+        raise KlinesFetchError(results=results, errors=errors)
+    return tuple(results[interval] for interval in intervals)
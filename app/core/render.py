@@ -0,0 +1,340 @@
+"""
+render.py
+
+Отрисовка графиков без pyplot: Figure + FigureCanvasAgg (backend Agg).
+Фигуры создаются один раз на каждую раскладку (вид графика и число таймфреймов)
+и переиспользуются: между запросами обновляются только данные артистов
+(set_data / set_verts / set_offsets), без пересоздания осей и повторного расчета раскладки.
+Одна фигура в один момент используется только одним потоком.
+
+Входные данные - только числа (массивы и словари), без Klines.
+С ImageEncoder картинка берется из буфера Agg и сжимается сразу, без промежуточного PNG.
+"""
+import threading
+from io import BytesIO
+from typing import Callable, Dict, List, Tuple
+
+import matplotlib.dates as mdates
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.patches import Rectangle
+from PIL import Image
+from scipy.signal import argrelextrema
+
+from app.core.downsample import lttb_indices, max_buckets
+from app.core.image_encoder import ImageEncoder
+
+# Меняется при любом изменении оформления графиков: ключи кэша рендера зависят от него
+STYLE_VERSION = 2
+
+TREND_FOOTER = (
+    "ATR — средний диапазон свечей (волатильность).\n"
+    "Сила тренда — R² линии регрессии (0-1)."
+)
+
+
+def ms_to_num(starts) -> np.ndarray:
+    """
+    Время в мс -> числа дат matplotlib
+    """
+    return mdates.date2num(np.asarray(starts, dtype=np.int64).astype('datetime64[ms]'))
+
+
+def _limits(low: float, high: float, margin: float = 0.05) -> Tuple[float, float]:
+    """
+    Пределы оси с полями, как у автомасштабирования matplotlib
+    """
+    if not np.isfinite(low) or not np.isfinite(high):
+        return 0.0, 1.0
+    span = high - low
+    if span <= 0:
+        span = abs(high) * 0.01 or 1.0
+    return low - span * margin, high + span * margin
+
+
+def _fill_verts(x: np.ndarray, lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
+    return np.concatenate([
+        np.column_stack([x, lower]),
+        np.column_stack([x[::-1], upper[::-1]]),
+    ])
+
+
+def _save(fig: Figure, dpi: int) -> BytesIO:
+    buf = BytesIO()
+    fig.savefig(buf, format='png', dpi=dpi)
+    buf.seek(0)
+    return buf
+
+
+def _snapshot(fig: Figure, dpi: int) -> Image.Image:
+    """
+    Отрисованная фигура как RGBA изображение
+    """
+    buf = BytesIO()
+    fig.savefig(buf, format='raw', dpi=dpi)
+    width = int(fig.get_figwidth() * dpi)
+    raw = buf.getbuffer()
+    return Image.frombuffer('RGBA', (width, len(raw) // (4 * width)), raw, 'raw', 'RGBA', 0, 1)
+
+
+class TrendChart:
+    """
+    Графики тренда: по оси на таймфрейм, общая легенда и подпись
+    """
+    DPI = 100
+
+    def __init__(self, rows: int):
+        self.fig = Figure(figsize=(14, 3 * rows))
+        FigureCanvasAgg(self.fig)
+        self.axes = self.fig.subplots(rows, 1, squeeze=False)[:, 0]
+        self.artists = []
+        for ax in self.axes:
+            line_close, = ax.plot([], [], label='Закрытие', marker='o')
+            line_trend, = ax.plot([], [], label='Линия тренда', color='orange')
+            line_reversal, = ax.plot([], [], label='Разворот', color='red', linestyle='--')
+            fill = ax.fill_between([0, 1], [0, 0], [0, 0], color='orange', alpha=0.1, label='Диапазон ATR')
+            maxima = ax.scatter([], [], color='green', marker='^', s=80)
+            minima = ax.scatter([], [], color='blue', marker='v', s=80)
+            ax.grid(True)
+            self.artists.append((line_close, line_trend, line_reversal, fill, maxima, minima))
+
+        handles = list(self.artists[0][:3])
+        self.fig.legend(handles, [h.get_label() for h in handles], loc='upper center', ncol=4, frameon=False)
+        self.fig.text(0.5, 0.01, TREND_FOOTER, ha='center', fontsize=10,
+                      bbox=dict(facecolor='white', alpha=0.8))
+        self.laid_out = False
+
+    def update(self, panels: List[dict]):
+        """
+        panels: label, closes (последнее окно), trend, strength, slope, atr, reversal_level
+        """
+        for ax, artists, panel in zip(self.axes, self.artists, panels):
+            line_close, line_trend, line_reversal, fill, maxima, minima = artists
+            closes = np.asarray(panel['closes'], dtype=np.float64)
+            x = np.arange(len(closes))
+
+            trend_line = closes[0] + panel['slope'] * x if len(closes) else x * 0.0
+            reversal = np.full(len(x), panel['reversal_level'], dtype=np.float64)
+            lower = trend_line - panel['atr']
+            upper = trend_line + panel['atr']
+
+            line_close.set_data(x, closes)
+            line_trend.set_data(x, trend_line)
+            line_reversal.set_data(x, reversal)
+            fill.set_verts([_fill_verts(x, lower, upper)])
+
+            local_max_idx = argrelextrema(closes, np.greater)[0]
+            local_min_idx = argrelextrema(closes, np.less)[0]
+            maxima.set_offsets(np.column_stack([local_max_idx, closes[local_max_idx]]))
+            minima.set_offsets(np.column_stack([local_min_idx, closes[local_min_idx]]))
+
+            ax.set_title(f"Тренд: {panel['trend']}, Сила={panel['strength']:.2f}")
+            ax.set_ylabel(panel['label'])
+            ax.set_xlim(*_limits(0, max(len(x) - 1, 1)))
+            values = np.concatenate([closes, lower, upper, reversal])
+            ax.set_ylim(*_limits(values.min(), values.max()))
+
+        if not self.laid_out:
+            self.fig.tight_layout(rect=[0, 0.05, 1, 0.95])
+            self.laid_out = True
+
+    def render(self, panels: List[dict]) -> BytesIO:
+        self.update(panels)
+        return _save(self.fig, self.DPI)
+
+    def snapshot(self, panels: List[dict]) -> Image.Image:
+        self.update(panels)
+        return _snapshot(self.fig, self.DPI)
+
+
+class ZonesChart:
+    """
+    Цена с зонами накопления/распределения и объемы: строка на таймфрейм
+    """
+    DPI = 150
+    COLORS = {'accumulation': 'green', 'distribution': 'blue'}
+
+    def __init__(self, rows: int):
+        self.fig = Figure(figsize=(18, 5 * rows))
+        FigureCanvasAgg(self.fig)
+        axes = self.fig.subplots(rows, 2, gridspec_kw={'width_ratios': [3, 1]}, squeeze=False)
+        self.rows = []
+        for ax_price, ax_vol in axes:
+            line_price, = ax_price.plot([], [], color='black', label='Цена')
+            ax_price.legend(loc='upper left')
+            bars = ax_vol.fill_between([0, 1], [0, 0], [0, 0], color='gray', linewidth=0)
+            for ax in (ax_price, ax_vol):
+                ax.grid(True)
+                ax.xaxis.set_major_locator(mdates.AutoDateLocator())
+                ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
+            self.rows.append({
+                'price': ax_price,
+                'volume': ax_vol,
+                'line': line_price,
+                'bars': bars,
+                # Пулы прямоугольников зон и линий прогноза, лишние скрываются
+                'rects': [],
+                'forecasts': [],
+            })
+        self.laid_out = False
+
+    @staticmethod
+    def _take(pool: list, used: int, create: Callable):
+        if used == len(pool):
+            pool.append(create())
+        artist = pool[used]
+        artist.set_visible(True)
+        return artist
+
+    def update(self, panels: List[dict]):
+        """
+        panels: label, starts (мс), closes, volumes, forecast_multiplier,
+        accumulation / distribution - массивы ZONE_STATS_DTYPE,
+        price_points / volume_bars - число точек цены и столбцов объема на графике
+        (None - без прореживания)
+        """
+        for row, panel in zip(self.rows, panels):
+            ax_price, ax_vol = row['price'], row['volume']
+            times = ms_to_num(panel['starts'])
+            closes = np.asarray(panel['closes'], dtype=np.float64)
+            volumes = np.asarray(panel['volumes'], dtype=np.float64)
+            # Границы зон, экстремумы цены внутри зон и на всем графике остаются на своих свечах
+            keep = [0, len(closes) - 1, int(closes.argmin()), int(closes.argmax())]
+            for kind in self.COLORS:
+                for stat in panel[kind]:
+                    start, end = int(stat['start_idx']), int(stat['end_idx'])
+                    zone = closes[start:end]
+                    keep += [start, end - 1, start + int(zone.argmin()), start + int(zone.argmax())]
+            price_points = panel.get('price_points')
+            shown = lttb_indices(times, closes, price_points, keep=keep) if price_points else np.arange(len(closes))
+            row['line'].set_data(times[shown], closes[shown])
+
+            rects_used = 0
+            forecasts_used = 0
+            low, high = closes.min(), closes.max()
+            for kind, color in self.COLORS.items():
+                for stat in panel[kind]:
+                    start, end = int(stat['start_idx']), int(stat['end_idx'])
+                    rect = self._take(row['rects'], rects_used,
+                                      lambda: ax_price.add_patch(Rectangle((0, 0), 0, 0, alpha=0.3)))
+                    rects_used += 1
+                    rect.set_facecolor(color)
+                    rect.set_alpha(0.3)
+                    rect.set_xy((times[start], stat['min_price']))
+                    rect.set_width(times[end - 1] - times[start])
+                    rect.set_height(stat['max_price'] - stat['min_price'])
+
+                    forecast_len = int((end - start) * panel['forecast_multiplier'])
+                    if end + forecast_len < len(times):
+                        line = self._take(row['forecasts'], forecasts_used,
+                                          lambda: ax_price.plot([], [], linestyle='--', alpha=0.7)[0])
+                        forecasts_used += 1
+                        line.set_color(color)
+                        line.set_data(times[end:end + forecast_len], np.full(forecast_len, stat['forecast_price']))
+                        low = min(low, stat['forecast_price'])
+                        high = max(high, stat['forecast_price'])
+            for artist in row['rects'][rects_used:] + row['forecasts'][forecasts_used:]:
+                artist.set_visible(False)
+
+            ax_price.set_title(f"{panel['label']} — Цена + зоны")
+            ax_price.set_xlim(*_limits(times[0], times[-1]))
+            ax_price.set_ylim(*_limits(low, high))
+
+            width = (times[1] - times[0]) * 0.8 if len(times) > 1 else 0.0005
+            # Столбец на корзину свечей: от первой до последней свечи корзины, высота - максимум
+            edges, heights = max_buckets(volumes, panel.get('volume_bars') or len(volumes))
+            left = times[edges[:-1]] - width / 2
+            right = times[edges[1:] - 1] + width / 2
+            bars = np.empty((len(heights), 4, 2))
+            bars[:, 0, 0] = bars[:, 1, 0] = left
+            bars[:, 2, 0] = bars[:, 3, 0] = right
+            bars[:, 0, 1] = bars[:, 3, 1] = 0.0
+            bars[:, 1, 1] = bars[:, 2, 1] = heights
+            row['bars'].set_verts(bars)
+            ax_vol.set_title(f"{panel['label']} — Объемы")
+            ax_vol.set_xlim(*_limits(left[0], right[-1]))
+            ax_vol.set_ylim(0, volumes.max() * 1.05 if len(volumes) and volumes.max() > 0 else 1.0)
+
+        if not self.laid_out:
+            self.fig.tight_layout()
+            self.laid_out = True
+
+    def render(self, panels: List[dict]) -> BytesIO:
+        self.update(panels)
+        return _save(self.fig, self.DPI)
+
+    def snapshot(self, panels: List[dict]) -> Image.Image:
+        self.update(panels)
+        return _snapshot(self.fig, self.DPI)
+
+
+class ChartPool:
+    """
+    Готовые фигуры по ключу (вид графика, число строк).
+    Занятая фигура не выдается другому потоку, при нехватке создается новая
+    """
+
+    def __init__(self):
+        self._free: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def render(self, chart_cls, panels: List[dict], encoder: ImageEncoder = None) -> BytesIO:
+        """
+        PNG графика или, с encoder, сжатое изображение
+        """
+        key = (chart_cls, len(panels))
+        with self._lock:
+            free = self._free.setdefault(key, [])
+            chart = free.pop() if free else None
+        if chart is None:
+            chart = chart_cls(len(panels))
+        try:
+            if encoder is None:
+                return chart.render(panels)
+            return BytesIO(encoder.encode(chart.snapshot(panels)))
+        finally:
+            with self._lock:
+                self._free[key].append(chart)
+
+
+chart_pool = ChartPool()
+
+
+def render_trend(panels: List[dict], encoder: ImageEncoder = None) -> BytesIO:
+    return chart_pool.render(TrendChart, panels, encoder)
+
+
+def render_zones(panels: List[dict], encoder: ImageEncoder = None) -> BytesIO:
+    return chart_pool.render(ZonesChart, panels, encoder)
+
+
+def render_single_trend(closes: np.ndarray, analysis: dict) -> BytesIO:
+    """
+    Один график тренда по последнему окну
+    """
+    panel = dict(analysis, closes=closes, label='')
+    return render_trend([panel])
+
+
+RENDERERS = {
+    'trend': render_trend,
+    'zones': render_zones,
+}
+
+
+def render_job(kind: str, panels: List[dict], encoder: ImageEncoder = None) -> bytes:
+    """
+    Задача рендера в процессе пула: изображение в байтах (PNG без encoder)
+    """
+    return RENDERERS[kind](panels, encoder).getvalue()
+
+
+def warm_up():
+    """
+    Первый рендер в процессе: загрузка шрифтов и кэшей matplotlib
+    """
+    closes = np.linspace(1.0, 2.0, 10)
+    render_single_trend(closes, {
+        'trend': 'side', 'strength': 0.0, 'slope': 0.0, 'atr': 0.0, 'reversal_level': 1.0,
+    })
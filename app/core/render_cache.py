@@ -0,0 +1,122 @@
+"""
+render_cache.py
+
+Кэш готовых графиков по содержимому.
+Ключ - хэш вида графика, версии оформления, параметров сжатия и всех входных
+данных панелей, значение - изображение и ссылка S3 после загрузки. Одинаковые входные данные
+(например, повторный запрос до закрытия свечей) не рисуются и не загружаются повторно.
+Вытеснение LRU с ограничением суммарного размера.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.image_encoder import ImageEncoder
+from app.core.render import STYLE_VERSION
+from conf.settings import settings
+from utils.s3 import upload_image
+
+
+# Сжатие графиков для загрузки и отправки
+chart_encoder = ImageEncoder(
+    settings.CHART_IMAGE_FORMAT,
+    max_bytes=settings.CHART_IMAGE_MAX_BYTES,
+    max_side=settings.CHART_IMAGE_MAX_SIDE,
+)
+
+
+def chart_key(kind: str, panels: List[dict], encoder: ImageEncoder = None) -> str:
+    """
+    Хэш графика: вид, версия оформления, сжатие и данные панелей
+    """
+    encoder = chart_encoder if encoder is None else encoder
+    digest = hashlib.sha256(f'{kind}:{STYLE_VERSION}:{encoder!r}:{len(panels)}'.encode())
+    for panel in panels:
+        for name in sorted(panel):
+            value = panel[name]
+            digest.update(name.encode())
+            if isinstance(value, np.ndarray):
+                digest.update(str(value.dtype.descr).encode())
+                digest.update(str(value.shape).encode())
+                digest.update(np.ascontiguousarray(value).tobytes())
+            else:
+                digest.update(repr(value).encode())
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """
+    LRU кэш: ключ -> (изображение, ссылка S3)
+    """
+    hits: int
+    misses: int
+
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = settings.RENDER_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self._entries: OrderedDict = OrderedDict()
+        self._urls: Dict[str, str] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                old_key, old_data = self._entries.popitem(last=False)
+                self._size -= len(old_data)
+                self._urls.pop(old_key, None)
+
+    def url(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._urls.get(key)
+
+    def set_url(self, key: str, url: str):
+        with self._lock:
+            if key in self._entries:
+                self._urls[key] = url
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "bytes": self._size,
+            }
+
+
+render_cache = RenderCache()
+
+
+def upload_chart(name: str, key: str, buf, encoder: ImageEncoder = None) -> str:
+    """
+    Загрузить график в S3 один раз на содержимое.
+    Имя файла включает ключ, повторный запрос получает ту же ссылку без загрузки
+    """
+    encoder = chart_encoder if encoder is None else encoder
+    url = render_cache.url(key)
+    if url is None:
+        url = upload_image(f'{name}-{key[:32]}', buf, extension=encoder.extension, content_type=encoder.content_type)
+        render_cache.set_url(key, url)
+    return url
@@ -0,0 +1,86 @@
+"""
+render_service.py
+
+Рендер графиков в отдельных процессах. Задачи - числовые панели
+(массивы и словари из trend_panels / zone_panels), результат - сжатое
+изображение в байтах через Future. Сжатие тоже выполняется в процессе
+рендера. Процессы запускаются заранее и прогревают matplotlib, так что
+графики тренда и зон рисуются одновременно и параллельно с расчетами.
+Готовые графики берутся из render_cache по хэшу входных данных.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Optional
+
+from app.core.render import render_job, warm_up
+from app.core.image_encoder import ImageEncoder
+from app.core.render_cache import chart_encoder, chart_key, render_cache
+from conf.settings import settings
+
+
+class RenderService:
+    """
+    Пул процессов рендера
+    """
+
+    def __init__(self, workers: int = None):
+        self.workers = settings.RENDER_WORKERS if workers is None else workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> 'RenderService':
+        """
+        Запустить процессы и выполнить в каждом прогревочный рендер
+        """
+        with self._lock:
+            if self._pool is None and self.workers > 0:
+                # spawn: процесс с потоками (сессии, кэш, RabbitMQ) безопасно не форкается
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=warm_up,
+                )
+                # Пул запускает процессы по мере появления задач
+                for future in [self._pool.submit(int) for _ in range(self.workers)]:
+                    future.result()
+        return self
+
+    def submit(self, kind: str, panels: List[dict], key: str = None, encoder: ImageEncoder = None) -> Future:
+        """
+        Future с изображением графика kind ('trend' / 'zones').
+        key - chart_key(kind, panels, encoder), если уже посчитан
+        """
+        encoder = chart_encoder if encoder is None else encoder
+        if key is None:
+            key = chart_key(kind, panels, encoder)
+        data = render_cache.get(key)
+        if data is not None:
+            future = Future()
+            future.set_result(data)
+            return future
+
+        if self.workers <= 0:
+            future = Future()
+            try:
+                future.set_result(render_job(kind, panels, encoder))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            self.start()
+            future = self._pool.submit(render_job, kind, panels, encoder)
+
+        def store(done: Future):
+            if done.exception() is None:
+                render_cache.put(key, done.result())
+        future.add_done_callback(store)
+        return future
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+render_service = RenderService()
@@ -0,0 +1,118 @@
+"""
+resample.py
+
+Построение старших таймфреймов из минутных свечей.
+Свеча старшего таймфрейма: open первой свечи, max high, min low,
+close последней, сумма volume и turnover.
+Границы свечей выравниваются как на бирже - от начала эпохи UTC.
+"""
+from typing import Tuple
+
+import numpy as np
+
+from API.ByBit.kline import Klines
+from app.core.frame import CandleFrame
+
+
+def resample_frame(
+        frame: CandleFrame,
+        interval: int,
+        base_interval: int = 1,
+        drop_partial_head: bool = True,
+) -> Tuple[CandleFrame, np.ndarray]:
+    """
+    Собрать свечи interval (в минутах) из свечей base_interval.
+
+    Параметры:
+    - frame: свечи base_interval в порядке старая -> новая
+    - interval: целевой таймфрейм, кратный base_interval
+    - drop_partial_head: отбросить первую свечу, если история начинается с середины её интервала
+
+    Возвращает:
+    - frame: свечи interval
+    - complete: маска свечей, собранных из полного набора базовых свечей.
+      Последняя свеча обычно неполная - это текущая незакрытая свеча
+    """
+    if interval % base_interval:
+        raise ValueError(f'Таймфрейм {interval} не кратен {base_interval}')
+    if not len(frame):
+        return CandleFrame.empty(), np.empty(0, dtype=bool)
+
+    step = interval * 60_000
+    buckets = frame.start // step * step
+    first = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    last = np.r_[first[1:] - 1, len(frame) - 1]
+    complete = (last - first + 1) == interval // base_interval
+
+    result = CandleFrame(
+        start=buckets[first],
+        open=frame.open[first],
+        high=np.maximum.reduceat(frame.high, first),
+        low=np.minimum.reduceat(frame.low, first),
+        close=frame.close[last],
+        volume=np.add.reduceat(frame.volume, first),
+        turnover=np.add.reduceat(frame.turnover, first),
+    )
+    if drop_partial_head and not complete[0]:
+        result = result[1:]
+        complete = complete[1:]
+    return result, complete
+
+
+def resample_klines(
+        klines: Klines,
+        interval: int,
+        max_length: int = None,
+) -> Klines:
+    """
+    Свечи interval, собранные из klines без запросов к бирже
+    """
+    frame, _ = resample_frame(
+        frame=klines.frame,
+        interval=interval,
+        base_interval=klines.interval,
+    )
+    if max_length is not None:
+        frame = frame[-max_length:]
+    return Klines.from_frame(
+        symbol=klines.symbol,
+        interval=interval,
+        frame=frame,
+    )
+
+
+def compare_with_native(
+        derived: CandleFrame,
+        native: CandleFrame,
+        rtol: float = 1e-9,
+) -> dict:
+    """
+    Сверка собранных свечей со свечами биржи по общим start.
+
+    Возвращает:
+    - matched: количество общих свечей
+    - missing: start свечей биржи, которых нет в собранных
+    - mismatches: колонка -> список start, где значения расходятся
+    """
+    if not len(derived):
+        return {"matched": 0, "missing": native.start.tolist(), "mismatches": {}}
+
+    common, derived_idx, native_idx = np.intersect1d(
+        derived.start, native.start, assume_unique=True, return_indices=True,
+    )
+    in_range = (native.start >= derived.start[0]) & (native.start <= derived.start[-1])
+    mismatches = {}
+    for name in CandleFrame.COLUMNS[1:]:
+        ok = np.isclose(
+            getattr(derived, name)[derived_idx],
+            getattr(native, name)[native_idx],
+            rtol=rtol,
+            atol=0,
+        )
+        if not ok.all():
+            mismatches[name] = common[~ok].tolist()
+    return {
+        "matched": len(common),
+        "missing": np.setdiff1d(native.start[in_range], derived.start).tolist(),
+        "mismatches": mismatches,
+    }
@@ -0,0 +1,101 @@
+"""
+store.py
+
+Локальное хранилище свечей на диске.
+Для каждой пары (symbol, category, interval) закрытые свечи дописываются
+в конец отдельных файлов по колонкам и читаются через np.memmap без копирования.
+Незакрытая (текущая) свеча не хранится: она меняется до закрытия и каждый раз
+берется с биржи.
+"""
+import os
+import threading
+from typing import Dict, Tuple
+
+import numpy as np
+
+from app.core.frame import CandleFrame
+from conf.settings import settings
+
+_locks: Dict[Tuple[str, str, int], threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+class CandleStore:
+    """
+    Хранилище свечей одного инструмента и таймфрейма
+    """
+    symbol: str
+    category: str
+    interval: int
+    path: str
+
+    def __init__(
+            self,
+            symbol: str,
+            category: str,
+            interval: int,
+            root: str = None,
+    ):
+        self.symbol = symbol
+        self.category = category
+        self.interval = interval
+        self.path = os.path.join(root or settings.CANDLE_STORE_DIR, f'{category}_{symbol}_{interval}')
+        os.makedirs(self.path, exist_ok=True)
+
+        key = (symbol, category, interval)
+        with _locks_guard:
+            self.lock = _locks.setdefault(key, threading.Lock())
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.path, f'{name}.bin')
+
+    def _dtype(self, name: str):
+        return np.int64 if name == 'start' else np.float64
+
+    def __len__(self) -> int:
+        """
+        Количество закрытых свечей.
+        После прерванной записи колонки могут отличаться по длине,
+        берем минимальную
+        """
+        lengths = []
+        for name in CandleFrame.COLUMNS:
+            path = self._column_path(name)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            lengths.append(size // np.dtype(self._dtype(name)).itemsize)
+        return min(lengths)
+
+    def load(self) -> CandleFrame:
+        """
+        Закрытые свечи. Колонки отображаются в память, без копирования
+        """
+        length = len(self)
+        if not length:
+            return CandleFrame.empty()
+        return CandleFrame(*[
+            np.memmap(self._column_path(name), dtype=self._dtype(name), mode='r', shape=(length,))
+            for name in CandleFrame.COLUMNS
+        ])
+
+    def append(self, frame: CandleFrame):
+        """
+        Дописать закрытые свечи в конец хранилища
+        """
+        if not len(frame):
+            return
+        length = len(self)
+        for name in CandleFrame.COLUMNS:
+            path = self._column_path(name)
+            with open(path, 'ab') as f:
+                # Отрезаем хвост от прерванной записи
+                f.truncate(length * np.dtype(self._dtype(name)).itemsize)
+                f.write(getattr(frame, name).tobytes())
+
+    def reset(self):
+        """
+        Очистить хранилище
+        """
+        for name in CandleFrame.COLUMNS:
+            path = self._column_path(name)
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,196 @@
+"""
+sweep.py
+
+Перебор параметров поиска зон и определения тренда на сохраненной истории свечей.
+Сетка делится по размеру окна: скользящие статистики окна (ZoneSeries.window_stats,
+регрессия и ATR по окнам) считаются один раз и переиспользуются всеми порогами.
+Группы окон считаются в пуле процессов, результаты пишутся в csv.
+"""
+import csv
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from app.core.accumulation.zones import ZoneSeries
+from app.core.frame import CandleFrame
+from app.core.store import CandleStore
+from app.core.trend.indicators.rolling import rolling_linregress
+from conf.settings import settings
+
+ZONE_GRID = {
+    "window_size": (10, 20, 40),
+    "price_std_threshold": (0.0025, 0.005, 0.01),
+    "volume_multiplier": (1.0, 1.2, 1.5),
+    "breakout_multiplier": (1.0, 1.5, 2.0),
+}
+
+TREND_GRID = {
+    "window_size": (20, 40, 80),
+    "slope_threshold": (0.1, 0.25, 0.5, 1.0),
+}
+
+# Данные истории в процессе пула, передаются один раз при запуске процесса
+_closes = None
+_volumes = None
+_series = None
+
+
+def _init_worker(closes: np.ndarray, volumes: np.ndarray):
+    global _closes, _volumes, _series
+    _closes = closes
+    _volumes = volumes
+    _series = ZoneSeries(closes, volumes)
+
+
+def load_history(symbol: str, interval: int, category: str = None, max_length: int = None) -> CandleFrame:
+    """
+    Закрытые свечи из локального хранилища
+    """
+    store = CandleStore(symbol=symbol, category=category or settings.CATEGORY_KLINE, interval=interval)
+    frame = store.load()
+    if not len(frame):
+        raise ValueError(f'Нет сохраненных свечей {symbol} {interval}m')
+    if max_length:
+        frame = frame[-max_length:]
+    return frame
+
+
+def _sweep_zones(window_size: int, grid: List[tuple], forecast_multiplier: float) -> List[dict]:
+    """
+    Все пороги зон для одного размера окна.
+    forecast_error - средняя относительная ошибка прогнозной цены зоны
+    через forecast_multiplier длин зоны после ее конца
+    """
+    rows = []
+    length = len(_closes)
+    for price_std_threshold, volume_multiplier, breakout_multiplier in grid:
+        acc_zones, dist_zones = _series.find_zones(
+            window_size=window_size,
+            price_std_threshold=price_std_threshold,
+            volume_multiplier=volume_multiplier,
+            breakout_multiplier=breakout_multiplier,
+        )
+        stats = _series.stats_index.stats(acc_zones + dist_zones)
+        horizon = np.maximum(((stats['end_idx'] - stats['start_idx']) * forecast_multiplier).astype(np.int64), 1)
+        target = stats['end_idx'] + horizon - 1
+        known = target < length
+        errors = np.abs(_closes[target[known]] - stats['forecast_price'][known]) / stats['forecast_price'][known]
+        rows.append({
+            "window_size": window_size,
+            "price_std_threshold": price_std_threshold,
+            "volume_multiplier": volume_multiplier,
+            "breakout_multiplier": breakout_multiplier,
+            "accumulation": len(acc_zones),
+            "distribution": len(dist_zones),
+            "mean_zone_length": float(np.mean(stats['end_idx'] - stats['start_idx'])) if len(stats) else 0.0,
+            "forecast_error": float(np.mean(errors)) if len(errors) else None,
+        })
+    return rows
+
+
+def _sweep_trend(window_size: int, thresholds: Sequence[float], horizon: int) -> List[dict]:
+    """
+    Все пороги наклона для одного размера окна.
+    hit_rate - доля окон bull/bear, после которых цена через horizon свечей
+    ушла в сторону тренда
+    """
+    rows = []
+    slopes, _, _ = rolling_linregress(_closes, window_size)
+    # Окно i заканчивается свечой i + window_size - 1
+    ends = np.arange(len(slopes)) + window_size - 1
+    known = ends + horizon < len(_closes)
+    slopes = slopes[known]
+    ends = ends[known]
+    future_return = _closes[ends + horizon] / _closes[ends] - 1
+
+    for slope_threshold in thresholds:
+        direction = np.where(slopes > slope_threshold, 1, np.where(slopes < -slope_threshold, -1, 0))
+        signed = (direction * future_return)[direction != 0]
+        rows.append({
+            "window_size": window_size,
+            "slope_threshold": slope_threshold,
+            "horizon": horizon,
+            "bull": int(np.sum(direction == 1)),
+            "bear": int(np.sum(direction == -1)),
+            "side": int(np.sum(direction == 0)),
+            "hit_rate": float(np.mean(signed > 0)) if len(signed) else None,
+            "mean_return": float(np.mean(signed)) if len(signed) else None,
+        })
+    return rows
+
+
+def write_table(path: str, rows: List[dict]):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', newline='') as f:
+        if not rows:
+            return
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def run_sweep(
+        symbol: str,
+        interval: int,
+        zone_grid: Dict[str, Sequence] = None,
+        trend_grid: Dict[str, Sequence] = None,
+        horizon: int = 10,
+        forecast_multiplier: float = 0.5,
+        category: str = None,
+        max_length: int = None,
+        max_workers: int = None,
+        output_dir: str = None,
+) -> dict:
+    """
+    Перебор сеток параметров зон и тренда по истории symbol/interval.
+
+    Возвращает:
+    - zones, trend: строки таблиц результатов
+    - paths: пути к записанным csv
+    """
+    zone_grid = zone_grid or ZONE_GRID
+    trend_grid = trend_grid or TREND_GRID
+    frame = load_history(symbol, interval, category=category, max_length=max_length)
+    closes = np.array(frame.close, dtype=np.float64)
+    volumes = np.array(frame.volume, dtype=np.float64)
+
+    thresholds = list(itertools.product(
+        zone_grid["price_std_threshold"],
+        zone_grid["volume_multiplier"],
+        zone_grid["breakout_multiplier"],
+    ))
+
+    with ProcessPoolExecutor(
+            max_workers=max_workers or settings.BATCH_WORKERS,
+            initializer=_init_worker,
+            initargs=(closes, volumes),
+    ) as pool:
+        zone_futures = [
+            pool.submit(_sweep_zones, window_size, thresholds, forecast_multiplier)
+            for window_size in zone_grid["window_size"]
+            if window_size < len(closes)
+        ]
+        trend_futures = [
+            pool.submit(_sweep_trend, window_size, trend_grid["slope_threshold"], horizon)
+            for window_size in trend_grid["window_size"]
+            if window_size + horizon < len(closes)
+        ]
+        zone_rows = [row for future in zone_futures for row in future.result()]
+        trend_rows = [row for future in trend_futures for row in future.result()]
+
+    output_dir = output_dir or settings.SWEEP_RESULTS_DIR
+    paths = {
+        "zones": os.path.join(output_dir, f'{symbol}_{interval}_zones.csv'),
+        "trend": os.path.join(output_dir, f'{symbol}_{interval}_trend.csv'),
+    }
+    write_table(paths["zones"], zone_rows)
+    write_table(paths["trend"], trend_rows)
+
+    return {
+        "zones": zone_rows,
+        "trend": trend_rows,
+        "paths": paths,
+    }
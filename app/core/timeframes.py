@@ -0,0 +1,72 @@
+"""
+timeframes.py
+
+Реестр таймфреймов анализа. Загрузка свечей, анализ тренда, общий сигнал
+и графики берут список таймфреймов, веса, глубину истории и окна отсюда,
+а не из собственных констант. Состав задается в settings.TIMEFRAMES.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional
+
+from conf.settings import settings
+
+
+def timeframe_label(interval: int) -> str:
+    return f'{interval}m'
+
+
+class Timeframe:
+    """
+    Параметры одного таймфрейма
+    """
+    interval: int
+    weight: float
+    lookback: int
+    window_size: int
+
+    def __init__(self, interval: int, weight: float, lookback: int = 1000, window_size: int = 40):
+        self.interval = interval
+        self.weight = weight
+        self.lookback = lookback
+        self.window_size = window_size
+
+    @property
+    def label(self) -> str:
+        return timeframe_label(self.interval)
+
+    @property
+    def lookback_minutes(self) -> int:
+        return self.interval * self.lookback
+
+    def __repr__(self):
+        return f'Timeframe({self.label}, weight={self.weight}, lookback={self.lookback}, window={self.window_size})'
+
+
+TIMEFRAMES: List[Timeframe] = [Timeframe(*params) for params in settings.TIMEFRAMES]
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.TIMEFRAME_WORKERS,
+    thread_name_prefix='timeframes',
+)
+
+
+def intervals() -> List[int]:
+    return [tf.interval for tf in TIMEFRAMES]
+
+
+def get_timeframe(key) -> Optional[Timeframe]:
+    """
+    Таймфрейм по интервалу (15) или подписи ('15m')
+    """
+    for tf in TIMEFRAMES:
+        if key == tf.interval or key == tf.label:
+            return tf
+    return None
+
+
+def map_timeframes(func: Callable, items: Iterable) -> list:
+    """
+    func для каждого элемента параллельно, результаты в исходном порядке.
+    func не должна сама ставить задачи в этот пул
+    """
+    return list(_executor.map(func, items))
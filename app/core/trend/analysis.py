@@ -1,5 +1,9 @@
 import numpy as np
 
+from app.core.timeframes import Timeframe, get_timeframe, map_timeframes
+from app.core.trend.indicators.trend_analysis import analyze_market_current_trend
+from utils.time import ms_to_dt
+
 
 def combine_multitimeframe_analysis(analyses: list, weights: list = None):
     """
@@ -32,16 +36,44 @@ def combine_multitimeframe_analysis(analyses: list, weights: list = None):
 
 
 def simplify_klines(klines, max_len=50):
-    shortened = klines.history[-max_len:]
+    frame = klines.frame[-max_len:]
     simplified = [
         {
-            "time": k.data[0].start_str,
-            "open": k.data[0].open,
-            "high": k.data[0].high,
-            "low": k.data[0].low,
-            "close": k.data[0].close,
-            "volume": k.data[0].volume,
+            "time": f"{start} | {ms_to_dt(int(start))}",
+            "open": open_,
+            "high": high,
+            "low": low,
+            "close": close,
+            "volume": volume,
         }
-        for k in shortened
+        for start, open_, high, low, close, volume in zip(
+            frame.start.tolist(),
+            frame.open.tolist(),
+            frame.high.tolist(),
+            frame.low.tolist(),
+            frame.close.tolist(),
+            frame.volume.tolist(),
+        )
     ]
     return simplified
+
+
+def analyze_trends(*klines):
+    """
+    Анализ тренда по каждому таймфрейму (параллельно) и общий сигнал.
+    Веса и окна таймфреймов берутся из реестра
+    """
+    timeframes = [get_timeframe(k.interval) or Timeframe(k.interval, weight=1) for k in klines]
+    analyses = map_timeframes(
+        lambda pair: analyze_market_current_trend(pair[0], window_size=pair[1].window_size),
+        zip(klines, timeframes),
+    )
+    weights = [tf.weight for tf in timeframes]
+    final_signal = combine_multitimeframe_analysis(analyses, weights)
+    return {
+        "timeframes": {
+            tf.label: {"analysis": analysis, "klines": simplify_klines(k, max_len=max(50, tf.window_size))}
+            for tf, analysis, k in zip(timeframes, analyses, klines)
+        },
+        "final_signal": final_signal
+    }
@@ -0,0 +1,206 @@
+"""
+incremental.py
+
+Потоковый анализ тренда: состояние последнего окна обновляется
+за O(1) на каждую свечу, без пересчета всей истории.
+Результат совпадает с analyze_market_current_trend по тому же окну.
+"""
+import threading
+from collections import deque
+from typing import Optional
+
+from app.core.trend.indicators.rolling import regression_from_sums
+from app.core.trend.indicators.trend_analysis import calculate_reversal_level, trend_from_slope
+from app.entrypoints.schemas.kline import CandleSchema
+
+
+class IncrementalTrendAnalyzer:
+    """
+    Скользящие суммы регрессии, скользящий ATR и очереди
+    подтвержденных локальных экстремумов последнего окна
+    """
+
+    def __init__(
+            self,
+            window_size: int = 40,
+            slope_threshold: float = 0.5,
+    ):
+        self.window_size = window_size
+        self.slope_threshold = slope_threshold
+
+        # Свечи окна: (start, high, low, close)
+        self._candles = deque(maxlen=window_size)
+        # True range внутри окна: по window_size - 1 парам соседних свечей
+        self._trs = deque(maxlen=window_size - 1)
+        self._tr_sum = 0.0
+
+        # Суммы регрессии по номерам свечей от self._base и ценам от self._offset
+        self._count = 0
+        self._base = 0
+        self._offset = None
+        self._s_y = 0.0
+        self._s_yy = 0.0
+        self._s_iy = 0.0
+        self._updates = 0
+
+        # Номера и цены подтвержденных локальных экстремумов
+        self._maxima = deque()
+        self._minima = deque()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_klines(cls, klines, window_size: int = 40, slope_threshold: float = 0.5):
+        """
+        Анализатор, заполненный последними свечами klines
+        """
+        analyzer = cls(window_size=window_size, slope_threshold=slope_threshold)
+        frame = klines.frame[-(window_size + 2):]
+        for start, high, low, close in zip(
+                frame.start.tolist(),
+                frame.high.tolist(),
+                frame.low.tolist(),
+                frame.close.tolist(),
+        ):
+            analyzer.push(start, high, low, close)
+        return analyzer
+
+    def attach(self, feed, interval: int):
+        """
+        Получать свечи таймфрейма interval из KlineFeed
+        """
+        def listener(candle_interval: int, candle: CandleSchema):
+            if candle_interval == interval:
+                self.update(candle)
+        feed.listeners.append(listener)
+
+    def update(self, candle: CandleSchema):
+        self.push(candle.start, float(candle.high), float(candle.low), float(candle.close))
+
+    def push(self, start: int, high: float, low: float, close: float):
+        """
+        Новая свеча или обновление последней (тот же start)
+        """
+        with self._lock:
+            if self._candles and start < self._candles[-1][0]:
+                return
+            if self._candles and start == self._candles[-1][0]:
+                self._replace_last(high, low, close)
+            else:
+                self._append(start, high, low, close)
+
+    def _append(self, start: int, high: float, low: float, close: float):
+        if self._offset is None:
+            self._offset = close
+
+        if len(self._candles) == self.window_size:
+            _, _, _, old_close = self._candles[0]
+            self._remove_sums(self._count - self.window_size, old_close)
+        if len(self._trs) == self.window_size - 1:
+            self._tr_sum -= self._trs[0]
+
+        if self._candles:
+            tr = self._true_range(high, low, self._candles[-1][3])
+            self._trs.append(tr)
+            self._tr_sum += tr
+
+        self._candles.append((start, high, low, close))
+        self._add_sums(self._count, close)
+        self._count += 1
+
+        # Предыдущая свеча стала окончательной, значит экстремум перед ней подтвержден
+        if len(self._candles) >= 4:
+            left, middle, right = self._candles[-4][3], self._candles[-3][3], self._candles[-2][3]
+            index = self._count - 3
+            if middle > left and middle > right:
+                self._maxima.append((index, middle))
+            elif middle < left and middle < right:
+                self._minima.append((index, middle))
+        self._prune_extrema()
+
+        self._updates += 1
+        if self._updates >= self.window_size:
+            self._rebase()
+
+    def _replace_last(self, high: float, low: float, close: float):
+        start, _, _, old_close = self._candles[-1]
+        self._remove_sums(self._count - 1, old_close)
+        self._add_sums(self._count - 1, close)
+        if len(self._candles) > 1:
+            tr = self._true_range(high, low, self._candles[-2][3])
+            self._tr_sum += tr - self._trs[-1]
+            self._trs[-1] = tr
+        self._candles[-1] = (start, high, low, close)
+
+    def _prune_extrema(self):
+        """
+        Экстремуму нужен сосед слева внутри окна
+        """
+        first = self._count - self.window_size
+        for extrema in (self._maxima, self._minima):
+            while extrema and extrema[0][0] <= first:
+                extrema.popleft()
+
+    @staticmethod
+    def _true_range(high: float, low: float, prev_close: float) -> float:
+        return max(high - low, abs(high - prev_close), abs(low - prev_close))
+
+    def _add_sums(self, index: int, close: float):
+        y = close - self._offset
+        i = index - self._base
+        self._s_y += y
+        self._s_yy += y * y
+        self._s_iy += i * y
+
+    def _remove_sums(self, index: int, close: float):
+        y = close - self._offset
+        i = index - self._base
+        self._s_y -= y
+        self._s_yy -= y * y
+        self._s_iy -= i * y
+
+    def _rebase(self):
+        """
+        Пересчет сумм с нуля: убирает накопленную ошибку округления
+        и держит номера свечей малыми
+        """
+        self._base = self._count - len(self._candles)
+        self._offset = self._candles[0][3]
+        self._s_y = self._s_yy = self._s_iy = 0.0
+        for i, (_, _, _, close) in enumerate(self._candles):
+            self._add_sums(self._base + i, close)
+        self._tr_sum = sum(self._trs)
+        self._updates = 0
+
+    def snapshot(self) -> Optional[dict]:
+        """
+        Текущий тренд в формате analyze_market_current_trend
+        или None, пока свечей меньше окна
+        """
+        with self._lock:
+            if len(self._candles) < self.window_size:
+                return None
+
+            first = self._count - self.window_size
+            s_ty = self._s_iy - (first - self._base) * self._s_y
+            slope, _, r2 = regression_from_sums(self._s_y, self._s_yy, s_ty, self.window_size)
+            atr = self._tr_sum / (self.window_size - 1)
+            trend = trend_from_slope(slope, self.slope_threshold)
+
+            last_max = self._maxima[-1][1] if self._maxima else None
+            last_min = self._minima[-1][1] if self._minima else None
+
+            # Предпоследняя свеча зависит от незакрытой последней
+            left, middle, right = self._candles[-3][3], self._candles[-2][3], self._candles[-1][3]
+            if middle > left and middle > right:
+                last_max = middle
+            elif middle < left and middle < right:
+                last_min = middle
+
+            close = self._candles[-1][3]
+            return {
+                "trend": trend,
+                "strength": float(r2),
+                "slope": float(slope),
+                "atr": atr,
+                "reversal_level": calculate_reversal_level(trend, close, atr, last_max, last_min),
+            }
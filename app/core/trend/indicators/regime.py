@@ -0,0 +1,188 @@
+"""
+regime.py
+
+Модель режимов рынка (кластеры по фичам slope, r2, atr).
+Центроиды хранятся на диске по (symbol, interval, window_size, n_clusters):
+масштаб фич зависит от размера окна, поэтому модели разных окон не смешиваются.
+Полное обучение KMeans выполняется один раз, дальше модель
+дообучается только на новых окнах (mini-batch обновление центроидов),
+а на каждый запрос выполняется только отнесение к кластеру.
+"""
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from sklearn.cluster import KMeans
+
+from conf.settings import settings
+
+
+class RegimeModel:
+    """
+    Кластеризация режимов рынка с дообучением
+    """
+    symbol: str
+    interval: int
+    window_size: int
+    n_clusters: int
+    centroids: Optional[np.ndarray]
+    counts: Optional[np.ndarray]
+    last_start: int
+
+    def __init__(
+            self,
+            symbol: str,
+            interval: int,
+            window_size: int,
+            n_clusters: int = 3,
+            max_count: int = 10_000,
+    ):
+        self.symbol = symbol
+        self.interval = interval
+        self.window_size = window_size
+        self.n_clusters = n_clusters
+        # Ограничение веса истории: центроиды продолжают следовать за рынком
+        self.max_count = max_count
+        self.centroids = None
+        self.counts = None
+        self.last_start = -1
+        self.lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(
+            settings.REGIME_MODEL_DIR,
+            f'{self.symbol}_{self.interval}_{self.window_size}_{self.n_clusters}.npz',
+        )
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.centroids is not None
+
+    def load(self) -> bool:
+        """
+        Загрузить модель с диска. Файл с другими параметрами не используется
+        """
+        if not os.path.exists(self.path):
+            return False
+        with np.load(self.path) as data:
+            if (
+                    'window_size' not in data
+                    or int(data['window_size']) != self.window_size
+                    or int(data['n_clusters']) != self.n_clusters
+                    or data['centroids'].shape[0] != self.n_clusters
+            ):
+                return False
+            self.centroids = data['centroids']
+            self.counts = data['counts']
+            self.last_start = int(data['last_start'])
+        return True
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                counts=self.counts,
+                last_start=self.last_start,
+                window_size=self.window_size,
+                n_clusters=self.n_clusters,
+            )
+        os.replace(tmp_path, self.path)
+
+    def fit(self, features: np.ndarray):
+        """
+        Полное обучение с нуля
+        """
+        kmeans = KMeans(n_clusters=self.n_clusters, random_state=42)
+        kmeans.fit(features)
+        self.centroids = kmeans.cluster_centers_
+        self.counts = np.minimum(np.bincount(kmeans.labels_, minlength=self.n_clusters), self.max_count)
+
+    def partial_fit(self, features: np.ndarray):
+        """
+        Сдвиг центроидов к новым точкам (скользящее среднее по кластеру)
+        """
+        if not len(features):
+            return
+        labels = self.predict(features)
+        batch_counts = np.bincount(labels, minlength=self.n_clusters)
+        sums = np.zeros_like(self.centroids)
+        np.add.at(sums, labels, features)
+
+        counts = self.counts + batch_counts
+        moved = batch_counts > 0
+        self.centroids[moved] += (
+            sums[moved] - batch_counts[moved, None] * self.centroids[moved]
+        ) / counts[moved, None]
+        self.counts = np.minimum(counts, self.max_count)
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        distances = ((features[:, None, :] - self.centroids[None, :, :]) ** 2).sum(axis=2)
+        return distances.argmin(axis=1)
+
+    def update(self, features: np.ndarray, window_ends: np.ndarray):
+        """
+        Дообучить на окнах, закрывшихся после прошлого обновления.
+        window_ends - start последней свечи каждого окна.
+        Последнее окно содержит незакрытую свечу и в обучение не попадает
+        """
+        with self.lock:
+            closed_features = features[:-1]
+            closed_ends = window_ends[:-1]
+            if not self.is_fitted:
+                if len(closed_features) < self.n_clusters:
+                    return
+                self.fit(closed_features)
+            else:
+                new = closed_ends > self.last_start
+                if not new.any():
+                    return
+                self.partial_fit(closed_features[new])
+            self.last_start = int(closed_ends[-1])
+            self.save()
+
+    def label_trends(self, labels: np.ndarray) -> np.ndarray:
+        """
+        Кластер с наибольшим наклоном - bull, с наименьшим - bear, остальные - side
+        """
+        order = np.argsort(self.centroids[:, 0])
+        names = np.full(self.n_clusters, 'side', dtype=object)
+        names[order[-1]] = 'bull'
+        names[order[0]] = 'bear'
+        return names[labels]
+
+
+_models: Dict[Tuple[str, int, int, int], RegimeModel] = {}
+_models_lock = threading.Lock()
+
+
+def get_regime_model(symbol: str, interval: int, window_size: int, n_clusters: int = 3) -> RegimeModel:
+    """
+    Модель из памяти процесса, при первом обращении - с диска
+    """
+    key = (symbol, interval, window_size, n_clusters)
+    with _models_lock:
+        model = _models.get(key)
+        if model is None:
+            model = RegimeModel(symbol=symbol, interval=interval, window_size=window_size, n_clusters=n_clusters)
+            model.load()
+            _models[key] = model
+    return model
+
+
+def classify_regime(klines, features: np.ndarray, window_size: int, n_clusters: int = 3) -> str:
+    """
+    Режим последнего окна: bull / bear / side
+    """
+    model = get_regime_model(klines.symbol, klines.interval, window_size, n_clusters)
+    model.update(features, klines.frame.start[window_size - 1:])
+    if not model.is_fitted:
+        # Истории меньше, чем кластеров: отнести некуда
+        return 'side'
+    with model.lock:
+        label = model.predict(features[-1:])
+        return model.label_trends(label)[0]
@@ -0,0 +1,117 @@
+"""
+rolling.py
+
+Скользящие индикаторы, посчитанные сразу для всех окон
+через накопленные суммы, без цикла по окнам.
+"""
+from typing import Tuple
+
+import numpy as np
+
+
+class PrefixSums:
+    """
+    Накопленные суммы ряда: статистики любого окна за O(1)
+    """
+
+    def __init__(self, y: np.ndarray):
+        y = np.asarray(y, dtype=np.float64)
+        # Центрирование уменьшает потерю точности в накопленных суммах
+        self.offset = y.mean() if len(y) else 0.0
+        y0 = y - self.offset
+        idx = np.arange(len(y0), dtype=np.float64)
+        self.length = len(y0)
+        self.c_y = np.concatenate(([0.0], np.cumsum(y0)))
+        self.c_yy = np.concatenate(([0.0], np.cumsum(y0 * y0)))
+        self.c_iy = np.concatenate(([0.0], np.cumsum(idx * y0)))
+
+    def mean(self, start, window: int):
+        """
+        Среднее y[start:start+window], start - число или массив
+        """
+        return (self.c_y[start + window] - self.c_y[start]) / window + self.offset
+
+    def regression(self, start, window: int):
+        """
+        Регрессия по окну y[start:start+window], start - число или массив
+        """
+        end = start + window
+        s_y = self.c_y[end] - self.c_y[start]
+        s_yy = self.c_yy[end] - self.c_yy[start]
+        s_ty = (self.c_iy[end] - self.c_iy[start]) - start * s_y
+        slope, intercept, r2 = regression_from_sums(s_y, s_yy, s_ty, window)
+        return slope, intercept + self.offset, r2
+
+
+def rolling_linregress(y: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Линейная регрессия y = intercept + slope * t по каждому окну длины window,
+    t = 0..window-1 внутри окна. Элемент i результата - окно y[i:i+window].
+
+    Возвращает:
+    - slope: наклон
+    - intercept: значение линии в начале окна
+    - r2: коэффициент детерминации (как LinearRegression.score)
+    """
+    prefix = PrefixSums(y)
+    return prefix.regression(np.arange(prefix.length - window + 1), window)
+
+
+def regression_from_sums(s_y, s_yy, s_ty, window: int):
+    """
+    Регрессия по суммам окна: s_y = sum(y), s_yy = sum(y^2), s_ty = sum(t*y),
+    t = 0..window-1. Работает и со скалярами, и с массивами сумм
+    """
+    t_mean = (window - 1) / 2
+    s_tt = window * (window * window - 1) / 12
+
+    slope = (s_ty - t_mean * s_y) / s_tt
+    intercept = s_y / window - slope * t_mean
+
+    ss_tot = s_yy - s_y * s_y / window
+    ss_reg = slope * slope * s_tt
+    # Окно без изменения цены: прямая описывает его полностью
+    flat = ss_tot <= 1e-12 * np.maximum(s_yy, np.finfo(np.float64).tiny)
+    r2 = np.where(flat, 1.0, ss_reg / np.where(flat, 1.0, ss_tot))
+    return slope, intercept, np.clip(r2, 0.0, 1.0)
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """
+    True range начиная со второй свечи: элемент i относится к свече i+1.
+    """
+    prev_close = close[:-1]
+    return np.maximum(high[1:] - low[1:],
+                      np.maximum(np.abs(high[1:] - prev_close),
+                                 np.abs(low[1:] - prev_close)))
+
+
+def rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    """
+    Скользящее среднее, элемент i - среднее x[i:i+window]
+    """
+    c = np.concatenate(([0.0], np.cumsum(x, dtype=np.float64)))
+    return (c[window:] - c[:-window]) / window
+
+
+def rolling_atr(tr: np.ndarray, window: int) -> np.ndarray:
+    """
+    ATR для каждого окна из window свечей.
+    Внутри окна true range считается по window-1 парам соседних свечей,
+    элемент i - окно свечей i..i+window-1
+    """
+    return rolling_mean(tr, window - 1)
+
+
+def rolling_std(x: np.ndarray, window: int) -> np.ndarray:
+    """
+    Скользящее стандартное отклонение (как np.std, ddof=0),
+    элемент i - окно x[i:i+window]
+    """
+    x = np.asarray(x, dtype=np.float64)
+    x0 = x - x.mean()
+    c = np.concatenate(([0.0], np.cumsum(x0)))
+    c2 = np.concatenate(([0.0], np.cumsum(x0 * x0)))
+    s = c[window:] - c[:-window]
+    s2 = c2[window:] - c2[:-window]
+    return np.sqrt(np.maximum(s2 / window - (s / window) ** 2, 0.0))
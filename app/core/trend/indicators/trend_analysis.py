@@ -1,167 +1,155 @@
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.cluster import KMeans
 from scipy.signal import argrelextrema
 from API.ByBit.kline import Klines
+from app.core.trend.indicators.regime import classify_regime
+
+
+def trend_from_slope(slope: float, slope_threshold: float) -> str:
+    if slope > slope_threshold:
+        return 'bull'
+    if slope < -slope_threshold:
+        return 'bear'
+    return 'side'
+
+
+def last_extrema(closes: np.ndarray):
+    """
+    Значения последнего локального максимума и минимума окна (None, если их нет)
+    """
+    local_max_idx = argrelextrema(closes, np.greater)[0]
+    local_min_idx = argrelextrema(closes, np.less)[0]
+    last_max = closes[local_max_idx[-1]] if len(local_max_idx) > 0 else None
+    last_min = closes[local_min_idx[-1]] if len(local_min_idx) > 0 else None
+    return last_max, last_min
+
+
+def calculate_reversal_level(trend: str, close: float, atr: float, last_max=None, last_min=None):
+    """
+    Уровень разворота по последним локальным экстремумам окна.
+    bull - последний минимум минус ATR, bear - последний максимум плюс ATR,
+    side - ближайший к цене экстремум
+    """
+    if trend == "bull":
+        return (last_min if last_min is not None else close) - atr
+    if trend == "bear":
+        return (last_max if last_max is not None else close) + atr
+    if last_max is not None and last_min is not None:
+        return last_max if abs(close - last_max) < abs(close - last_min) else last_min
+    return close
 
 
 def analyze_market_current_trend(
         klines: 'Klines',
         window_size: int = 40,
         n_clusters: int = 3,
-        slope_threshold: float = 0.5
+        slope_threshold: float = 0.5,
+        regime: bool = False,
 ):
     """
     Определяем текущий тренд по последнему окну свечей.
-    Плюс кластеризация истории через KMeans.
+    С regime=True дополнительно возвращает режим рынка по кластерам истории,
+    иначе кластеризация не выполняется.
     """
-    closes = np.array([float(candle.close) for k in klines.history for candle in k.data])
-    highs = np.array([float(candle.high) for k in klines.history for candle in k.data])
-    lows = np.array([float(candle.low) for k in klines.history for candle in k.data])
+    closes = klines.frame.close
 
     # --- Формирование фичей для кластеризации ---
-    features = []
-    for start in range(len(closes) - window_size + 1):
-        end = start + window_size
-        c_window = closes[start:end]
-        h_window = highs[start:end]
-        l_window = lows[start:end]
-        t = np.arange(window_size).reshape(-1, 1)
-
-        lr = LinearRegression().fit(t, c_window)
-        slope = lr.coef_[0]
-        r2 = lr.score(t, c_window)
-
-        tr = np.maximum(h_window[1:] - l_window[1:],
-                        np.maximum(np.abs(h_window[1:] - c_window[:-1]),
-                                   np.abs(l_window[1:] - c_window[:-1])))
-        atr = np.mean(tr)
-        features.append([slope, r2, atr])
-    features = np.array(features)
-
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-    kmeans.fit(features)
+    slopes, _, r2s = klines.features.regression(window_size)
+    atrs = klines.features.atr(window_size)
 
     # --- Последнее окно ---
     last_close = closes[-window_size:]
-    last_high = highs[-window_size:]
-    last_low = lows[-window_size:]
 
-    t_last = np.arange(window_size).reshape(-1, 1)
-    lr_last = LinearRegression().fit(t_last, last_close)
-    slope_last = lr_last.coef_[0]
-    r2_last = lr_last.score(t_last, last_close)
-
-    tr_last = np.maximum(last_high[1:] - last_low[1:],
-                         np.maximum(np.abs(last_high[1:] - last_close[:-1]),
-                                    np.abs(last_low[1:] - last_close[:-1])))
-    atr_last = np.mean(tr_last)
+    slope_last = slopes[-1]
+    r2_last = r2s[-1]
+    atr_last = atrs[-1]
 
     # --- Определение тренда ---
-    if slope_last > slope_threshold:
-        trend = 'bull'
-    elif slope_last < -slope_threshold:
-        trend = 'bear'
-    else:
-        trend = 'side'
+    trend = trend_from_slope(slope_last, slope_threshold)
 
     # --- Локальные экстремумы для уровня разворота ---
-    local_max_idx = argrelextrema(last_close, np.greater)[0]
-    local_min_idx = argrelextrema(last_close, np.less)[0]
-
-    if trend == "bull":
-        reversal_level = last_close[local_min_idx[-1]] - atr_last if len(local_min_idx) > 0 else last_close[-1] - atr_last
-    elif trend == "bear":
-        reversal_level = last_close[local_max_idx[-1]] + atr_last if len(local_max_idx) > 0 else last_close[-1] + atr_last
-    else:
-        if len(local_max_idx) > 0 and len(local_min_idx) > 0:
-            nearest_extreme = last_close[local_max_idx[-1]] if abs(last_close[-1] - last_close[local_max_idx[-1]]) < abs(last_close[-1] - last_close[local_min_idx[-1]]) else last_close[local_min_idx[-1]]
-            reversal_level = nearest_extreme
-        else:
-            reversal_level = last_close[-1]
+    last_max, last_min = last_extrema(last_close)
+    reversal_level = calculate_reversal_level(trend, last_close[-1], atr_last, last_max, last_min)
 
-    return {
+    result = {
         "trend": trend,
         "strength": r2_last,
         "slope": slope_last,
         "atr": atr_last,
         "reversal_level": reversal_level,
     }
+    if regime:
+        features = np.column_stack([slopes, r2s, atrs])
+        result["regime"] = classify_regime(klines, features, window_size, n_clusters)
+    return result
 
 
 def analyze_market(klines: 'Klines', window_size: int = 40, n_clusters: int = 3):
     """
     Анализ рынка с кластеризацией и уровнем разворота.
     """
-    closes = np.array([float(candle.close) for k in klines.history for candle in k.data])
-    highs = np.array([float(candle.high) for k in klines.history for candle in k.data])
-    lows = np.array([float(candle.low) for k in klines.history for candle in k.data])
-
-    features = []
-    for start in range(len(closes) - window_size + 1):
-        end = start + window_size
-        c_window = closes[start:end]
-        h_window = highs[start:end]
-        l_window = lows[start:end]
-        t = np.arange(window_size).reshape(-1, 1)
-
-        lr = LinearRegression().fit(t, c_window)
-        slope = lr.coef_[0]
-        r2 = lr.score(t, c_window)
-
-        tr = np.maximum(h_window[1:] - l_window[1:],
-                        np.maximum(np.abs(h_window[1:] - c_window[:-1]),
-                                   np.abs(l_window[1:] - c_window[:-1])))
-        atr = np.mean(tr)
-
-        features.append([slope, r2, atr])
-
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-    kmeans.fit(np.array(features))
-    labels = kmeans.labels_
-
-    last_cluster = labels[-1]
-    cluster_centers = kmeans.cluster_centers_
-    sorted_clusters = np.argsort(cluster_centers[:, 0])
-    if last_cluster == sorted_clusters[-1]:
-        trend = "bull"
-    elif last_cluster == sorted_clusters[0]:
-        trend = "bear"
-    else:
-        trend = "side"
+    closes = klines.frame.close
+
+    slopes, _, r2s = klines.features.regression(window_size)
+    atrs = klines.features.atr(window_size)
+    features = np.column_stack([slopes, r2s, atrs])
+
+    trend = classify_regime(klines, features, window_size, n_clusters)
 
     # --- Последнее окно ---
     last_close = closes[-window_size:]
-    last_high = highs[-window_size:]
-    last_low = lows[-window_size:]
-
-    lr_last = LinearRegression().fit(np.arange(window_size).reshape(-1, 1), last_close)
-    slope_last = lr_last.coef_[0]
 
-    tr_last = np.maximum(last_high[1:] - last_low[1:],
-                         np.maximum(np.abs(last_high[1:] - last_close[:-1]),
-                                    np.abs(last_low[1:] - last_close[:-1])))
-    atr_last = np.mean(tr_last)
+    slope_last = slopes[-1]
+    atr_last = atrs[-1]
 
     # --- Локальные экстремумы ---
-    local_max_idx = argrelextrema(last_close, np.greater)[0]
-    local_min_idx = argrelextrema(last_close, np.less)[0]
-
-    if trend == "bull":
-        reversal_level = last_close[local_min_idx[-1]] - atr_last if len(local_min_idx) > 0 else last_close[-1] - atr_last
-    elif trend == "bear":
-        reversal_level = last_close[local_max_idx[-1]] + atr_last if len(local_max_idx) > 0 else last_close[-1] + atr_last
-    else:
-        if len(local_max_idx) > 0 and len(local_min_idx) > 0:
-            nearest_extreme = last_close[local_max_idx[-1]] if abs(last_close[-1] - last_close[local_max_idx[-1]]) < abs(last_close[-1] - last_close[local_min_idx[-1]]) else last_close[local_min_idx[-1]]
-            reversal_level = nearest_extreme
-        else:
-            reversal_level = last_close[-1]
+    last_max, last_min = last_extrema(last_close)
+    reversal_level = calculate_reversal_level(trend, last_close[-1], atr_last, last_max, last_min)
 
     return {
         "trend": trend,
-        "strength": lr_last.score(np.arange(window_size).reshape(-1, 1), last_close),
+        "strength": r2s[-1],
         "slope": slope_last,
         "atr": atr_last,
         "reversal_level": reversal_level
     }
+
+
+WINDOW_SCAN_DTYPE = np.dtype([
+    ("window_size", np.int64),
+    ("trend", "U4"),
+    ("slope", np.float64),
+    ("strength", np.float64),
+    ("atr", np.float64),
+    ("reversal_level", np.float64),
+])
+
+
+def scan_window_sizes(
+        klines: 'Klines',
+        window_sizes=(20, 40, 80, 160),
+        slope_threshold: float = 0.5,
+) -> np.ndarray:
+    """
+    Тренд по последнему окну для нескольких размеров окна за один проход.
+    Накопленные суммы цен и true range считаются один раз и общие для всех окон.
+
+    Возвращает таблицу (structured array) со строкой на каждый размер окна,
+    поля как у analyze_market_current_trend. Окна длиннее истории пропускаются
+    """
+    closes = klines.frame.close
+    n = len(closes)
+    prices = klines.features.price_sums
+    trs = klines.features.tr_sums
+
+    rows = []
+    for window_size in window_sizes:
+        if window_size > n:
+            continue
+        slope, _, r2 = prices.regression(n - window_size, window_size)
+        atr = trs.mean(trs.length - (window_size - 1), window_size - 1)
+        trend = trend_from_slope(slope, slope_threshold)
+        last_close = closes[-window_size:]
+        last_max, last_min = last_extrema(last_close)
+        reversal_level = calculate_reversal_level(trend, last_close[-1], atr, last_max, last_min)
+        rows.append((window_size, trend, slope, r2, atr, reversal_level))
+    return np.array(rows, dtype=WINDOW_SCAN_DTYPE)
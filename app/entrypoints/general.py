@@ -1,5 +1,6 @@
 import time
 import json
+from io import BytesIO
 import requests
 from uuid import uuid4
 from telebot import types
@@ -7,14 +8,14 @@ from telebot.types import Message
 
 from API.settings import get_prompt
 from app.entrypoints.s_redis import add_message
-from app.core.accumulation.plotter import plot_market_and_report
-from app.core.trend.analysis import combine_multitimeframe_analysis, simplify_klines
-from app.core.klines import get_klines
-from app.core.trend.indicators.trend_analysis import analyze_market_current_trend
-from app.core.trend.indicators.trend_plot import plot_analysis
+from app.core.accumulation.plotter import zones_report
+from app.core.trend.analysis import analyze_trends
+from app.core.klines import get_klines, KlinesFetchError
+from app.core.render_cache import chart_key, upload_chart
+from app.core.render_service import render_service
+from app.core.trend.indicators.trend_plot import trend_panels
 from app.entrypoints.schemas.actions import ActionSchema
 from conf.settings import settings
-from utils.s3 import upload_image
 
 HEADERS_API = {
     "Authorization": f"Bearer {settings.OPENAI_API_KEY}",  # ключ в settings
@@ -47,28 +48,8 @@ def log_step(message: Message, chat_uuid: str, text: str, data: ActionSchema):
     return message
 
 
-def analyze_trends(kline_1, kline_15, kline_30, kline_60):
-    analyses = [
-        analyze_market_current_trend(kline_1),
-        analyze_market_current_trend(kline_15),
-        analyze_market_current_trend(kline_30),
-        analyze_market_current_trend(kline_60)
-    ]
-    weights = [1, 2, 3, 4]
-    final_signal = combine_multitimeframe_analysis(analyses, weights)
-    return {
-        "timeframes": {
-            "1m": {"analysis": analyses[0], "klines": simplify_klines(kline_1)},
-            "15m": {"analysis": analyses[1], "klines": simplify_klines(kline_15)},
-            "30m": {"analysis": analyses[2], "klines": simplify_klines(kline_30)},
-            "60m": {"analysis": analyses[3], "klines": simplify_klines(kline_60)},
-        },
-        "final_signal": final_signal
-    }
-
-
-def plot_zones(kline_1, kline_15, kline_30, kline_60):
-    return plot_market_and_report(kline_1, kline_15, kline_30, kline_60)
+def plot_zones(*klines):
+    return zones_report(*klines)
 
 
 def gpt_step(chat_uuid: str, prompt_text: str, message: Message, title: str, data: ActionSchema):
@@ -136,20 +117,31 @@ def handle_general_script(
     chat_uuid = str(uuid4())
 
     message = log_step(message, chat_uuid, "\n\n- 📊 Сбор и подготовка данных", data=data)
-    kline_1, kline_15, kline_30, kline_60 = get_klines()
+    try:
+        klines = get_klines()
+    except KlinesFetchError as e:
+        log_step(message, chat_uuid, f"- ❌ {e}", data=data)
+        return False
     message = log_step(message, chat_uuid, "- Свечи получены", data=data)
 
-    data_trend = analyze_trends(kline_1, kline_15, kline_30, kline_60)
+    data_trend = analyze_trends(*klines)
     message = log_step(message, chat_uuid, "- Тренды обработаны", data=data)
 
-    image_trend, data_trend = plot_analysis(data_trend)
+    # Графики рисуются в процессах рендера, пока считаются зоны
+    trend_chart = trend_panels(data_trend)
+    trend_key = chart_key('trend', trend_chart)
+    trend_future = render_service.submit('trend', trend_chart, key=trend_key)
     message = log_step(message, chat_uuid, "- Анализ тренда завершён", data=data)
 
-    image_zones, report_zones, data_zones = plot_zones(kline_1, kline_15, kline_30, kline_60)
+    zone_panels, report_zones, data_zones = plot_zones(*klines)
+    zones_key = chart_key('zones', zone_panels)
+    zones_future = render_service.submit('zones', zone_panels, key=zones_key)
+    image_trend = BytesIO(trend_future.result())
+    image_zones = BytesIO(zones_future.result())
     message = log_step(message, chat_uuid, "- Зоны построены", data=data)
 
-    img_zones = upload_image(f"image_zones-{chat_uuid}", image_zones)
-    img_trend = upload_image(f"image_trend-{chat_uuid}", image_trend)
+    img_zones = upload_chart("image_zones", zones_key, image_zones)
+    img_trend = upload_chart("image_trend", trend_key, image_trend)
     add_message(chat_uuid, 'general_analysis', 'img_url', img_zones, role='assistant', context=data.extra.context, code=data.extra.code)
     add_message(chat_uuid, 'general_analysis', 'img_url', img_trend, role='assistant', context=data.extra.context, code=data.extra.code)
 
@@ -3,15 +3,16 @@
 """
 import datetime
 import json
+from io import BytesIO
 import requests
 
 from API.settings import get_prompt
-from app.core.accumulation.plotter import plot_market_and_report
-from app.core.klines import get_klines
+from app.core.accumulation.plotter import zones_report
+from app.core.klines import get_klines, KlinesFetchError
 from app.entrypoints.mail import send_to_rabbitmq
-from app.core.trend.analysis import combine_multitimeframe_analysis, simplify_klines
-from app.core.trend.indicators.trend_analysis import analyze_market_current_trend
-from app.core.trend.indicators.trend_plot import plot_analysis
+from app.core.trend.analysis import analyze_trends
+from app.core.render_service import render_service
+from app.core.trend.indicators.trend_plot import trend_panels
 from app.entrypoints.schemas.actions import ActionSchema
 from app.entrypoints.s_redis import add_message
 from API.schemas.settings import SettingsBanSchema
@@ -26,26 +27,6 @@ def fetch_klines(chat_uuid: str):
     return klines
 
 
-def analyze_trends(kline_1, kline_15, kline_30, kline_60):
-    analysis_1m = analyze_market_current_trend(kline_1)
-    analysis_15m = analyze_market_current_trend(kline_15)
-    analysis_30m = analyze_market_current_trend(kline_30)
-    analysis_60m = analyze_market_current_trend(kline_60)
-    analyses = [analysis_1m, analysis_15m, analysis_30m, analysis_60m]
-    weights = [1, 2, 3, 4]
-    final_signal = combine_multitimeframe_analysis(analyses, weights)
-
-    return {
-        "timeframes": {
-            "1m": {"analysis": analysis_1m, "klines": simplify_klines(kline_1)},
-            "15m": {"analysis": analysis_15m, "klines": simplify_klines(kline_15)},
-            "30m": {"analysis": analysis_30m, "klines": simplify_klines(kline_30)},
-            "60m": {"analysis": analysis_60m, "klines": simplify_klines(kline_60)},
-        },
-        "final_signal": final_signal
-    }
-
-
 def gpt_request(chat_uuid: str, prompt_name: str, data, action_data: ActionSchema):
     prompt = get_prompt(prompt_code=prompt_name)
     if not prompt:
@@ -110,14 +91,21 @@ def handle_trend_analiz(data: ActionSchema):
     chat_uuid = str(datetime.datetime.now().timestamp())
     add_message(chat_uuid, 'trend_analysis', 'text', 'Запуск анализа тренда', role='assistant', code=data.extra.code, context=data.extra.context)
 
-    kline_1, kline_15, kline_30, kline_60 = fetch_klines(chat_uuid)
+    try:
+        klines = fetch_klines(chat_uuid)
+    except KlinesFetchError as e:
+        add_message(chat_uuid, 'trend_analysis', 'text', str(e), role='system', code=data.extra.code, context=data.extra.context)
+        return None
     add_message(chat_uuid, 'trend_analysis', 'text', 'Свечи получены', role='assistant', code=data.extra.code, context=data.extra.context)
 
-    data_trend = analyze_trends(kline_1, kline_15, kline_30, kline_60)
+    data_trend = analyze_trends(*klines)
     add_message(chat_uuid, 'trend_analysis', 'text', 'Тренды обработаны', role='assistant', code=data.extra.code, context=data.extra.context)
 
-    image_trend, _ = plot_analysis(data_trend)
-    image_zones, report_zones, _ = plot_market_and_report(kline_1, kline_15, kline_30, kline_60)
+    trend_future = render_service.submit('trend', trend_panels(data_trend))
+    zone_panels, report_zones, _ = zones_report(*klines)
+    zones_future = render_service.submit('zones', zone_panels)
+    image_trend = BytesIO(trend_future.result())
+    image_zones = BytesIO(zones_future.result())
     add_message(chat_uuid, 'trend_analysis', 'text', 'Графики построены', role='assistant', code=data.extra.code, context=data.extra.context)
 
     gpt_answer_trend = gpt_request(chat_uuid, 'trend_analiz_klines', data_trend, action_data=data)
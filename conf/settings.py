@@ -65,6 +65,62 @@ class Settings:
     CATEGORY_KLINE: str = 'inverse'
     SYMBOL: str = 'BTCUSDT'
 
+    # Таймфреймы анализа: (интервал в минутах, вес в общем сигнале,
+    # глубина истории в свечах, окно тренда в свечах)
+    TIMEFRAMES: list = [
+        (1, 1, 1000, 40),
+        (15, 2, 1000, 40),
+        (30, 3, 1000, 40),
+        (60, 4, 1000, 40),
+    ]
+    # Потоки для расчетов по таймфреймам
+    TIMEFRAME_WORKERS: int = 4
+
+    # Таймаут одного HTTP запроса к бирже, сек
+    KLINES_HTTP_TIMEOUT: int = 10
+    # Общий таймаут параллельной загрузки всех таймфреймов, сек
+    KLINES_FETCH_TIMEOUT: int = 30
+    KLINES_FETCH_WORKERS: int = 4
+    # Максимум запросов свечей в секунду (общий лимит процесса)
+    KLINES_RATE_LIMIT: float = 10
+    # Параллельные запросы страниц при загрузке длинной истории
+    KLINES_PAGE_WORKERS: int = 4
+    # Локальное хранилище свечей: с биржи догружаются только новые свечи
+    KLINES_USE_STORE: bool = True
+    CANDLE_STORE_DIR: str = os.getenv('CANDLE_STORE_DIR', 'data/candles')
+    # Собирать 15m/30m/60m из минутных свечей вместо отдельных запросов.
+    # Имеет смысл вместе с KLINES_USE_STORE, иначе минутная история грузится целиком
+    KLINES_RESAMPLE: bool = False
+    # Живой поток свечей через WebSocket, get_klines отдает свечи из памяти
+    KLINES_FEED_ENABLED: bool = False
+    # Размер буфера для таймфреймов вне реестра (для остальных - их lookback)
+    KLINES_FEED_CAPACITY: int = 1000
+    KLINES_FEED_URL: str = f'wss://stream{"-testnet" if TEST_NET else ""}.bybit.com/v5/public/{CATEGORY_KLINE}'
+    # Общий кэш свечей до закрытия текущей свечи таймфрейма
+    KLINES_CACHE_ENABLED: bool = True
+
+    # Список инструментов для пакетного анализа через запятую
+    WATCHLIST: list = os.getenv('WATCHLIST', SYMBOL).split(',')
+    BATCH_WORKERS: int = os.cpu_count()
+
+    # Сохраненные центроиды кластеров режимов рынка
+    REGIME_MODEL_DIR: str = os.getenv('REGIME_MODEL_DIR', 'data/regime')
+    # Процессы для рендера графиков, 0 - рендер в текущем процессе
+    RENDER_WORKERS: int = 2
+    # Точек цены и столбцов объема на графике зон (0 - без прореживания)
+    CHART_PRICE_POINTS: int = 500
+    CHART_VOLUME_BARS: int = 200
+    # Сжатие графиков перед загрузкой: формат (png / jpeg / webp),
+    # предел размера файла в байтах и длинной стороны в пикселях (0 - без ограничения)
+    CHART_IMAGE_FORMAT: str = 'png'
+    CHART_IMAGE_MAX_BYTES: int = 1024 * 1024
+    CHART_IMAGE_MAX_SIDE: int = 2048
+    # Кэш готовых графиков по содержимому (изображение и ссылка S3), байт
+    RENDER_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # Таблицы результатов перебора параметров зон и тренда
+    SWEEP_RESULTS_DIR: str = os.getenv('SWEEP_RESULTS_DIR', 'data/sweeps')
+
     ################################
     #/ S3 Client
     ################################
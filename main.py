@@ -4,6 +4,9 @@ import pika
 from dotenv import load_dotenv
 from pika.exceptions import AMQPConnectionError, ChannelClosed, ConnectionClosed
 
+from app.core.feed import start_feed
+from app.core.render_service import render_service
+from app.core.timeframes import intervals
 from app.entrypoints.proccess_message import process_message
 from conf.settings import settings
 
@@ -52,6 +55,9 @@ def consume_rabbitmq():
         #     time.sleep(RECONNECT_DELAY)
 
 if __name__ == "__main__":
+    render_service.start()
+    if settings.KLINES_FEED_ENABLED:
+        start_feed(symbol=settings.SYMBOL, intervals=intervals())
     try:
         consume_rabbitmq()
     except KeyboardInterrupt:
@@ -0,0 +1,23 @@
+"""
+candles.py
+
+Случайные свечи для тестов. Цены округлены до шага биржи, поэтому
+встречаются равные соседние закрытия и участки без изменения цены.
+"""
+import numpy as np
+
+from app.core.frame import CandleFrame
+
+
+def random_frame(seed: int, length: int = 1000, interval: int = 1) -> CandleFrame:
+    rng = np.random.default_rng(seed)
+    close = np.round(65000 + np.cumsum(rng.normal(0, 20, length)), 1)
+    # Цена стоит на месте дольше окна анализа
+    flat = int(rng.integers(0, length - 60))
+    close[flat:flat + 50] = close[flat]
+    open_ = np.round(np.concatenate(([close[0]], close[:-1])) + rng.normal(0, 5, length), 1)
+    high = np.maximum(open_, close) + np.round(rng.random(length) * 10, 1)
+    low = np.minimum(open_, close) - np.round(rng.random(length) * 10, 1)
+    volume = np.round(rng.random(length) * 100, 3)
+    start = 1_760_000_000_000 + interval * 60_000 * np.arange(length)
+    return CandleFrame(start, open_, high, low, close, volume, close * volume)
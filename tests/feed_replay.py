@@ -0,0 +1,89 @@
+"""
+feed_replay.py
+
+Локальный WebSocket сервер, который отвечает на подписку как Bybit и
+проигрывает записанные сообщения kline.{interval}.{symbol}.
+Сообщения хранятся в jsonl: одна строка - одно сообщение биржи.
+record_frames записывает такой файл с настоящего потока.
+"""
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List
+
+import websocket
+from websockets.sync.server import serve
+
+DATA_DIR = Path(__file__).parent / 'data'
+
+
+def load_frames(path) -> List[dict]:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def record_frames(url: str, topics: List[str], count: int, path):
+    """
+    Записать count сообщений потока в jsonl
+    """
+    ws = websocket.create_connection(url, timeout=30)
+    try:
+        ws.send(json.dumps({"op": "subscribe", "args": topics}))
+        with open(path, 'w', encoding='utf-8') as f:
+            written = 0
+            while written < count:
+                payload = json.loads(ws.recv())
+                if payload.get('topic', '').startswith('kline.'):
+                    f.write(json.dumps(payload) + '\n')
+                    written += 1
+    finally:
+        ws.close()
+
+
+class FakeBybitServer:
+    """
+    Сервер на свободном порту: подтверждает подписку и отправляет сообщения
+    только по подписанным топикам, затем держит соединение открытым
+    """
+
+    def __init__(self, frames: List[dict], host: str = '127.0.0.1'):
+        self.frames = frames
+        self.subscriptions: List[List[str]] = []
+        self.replayed = threading.Event()
+        self._server = serve(self._handler, host, 0)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.socket.getsockname()[:2]
+        return f'ws://{host}:{port}'
+
+    def __enter__(self) -> 'FakeBybitServer':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._thread.join(timeout=5)
+
+    def _handler(self, connection):
+        request = json.loads(connection.recv())
+        topics = request.get('args', [])
+        self.subscriptions.append(topics)
+        connection.send(json.dumps({"success": True, "ret_msg": "", "op": "subscribe", "conn_id": "replay"}))
+        for frame in self.frames:
+            if frame['topic'] in topics:
+                connection.send(json.dumps(frame))
+        self.replayed.set()
+        for _ in connection:
+            pass
+
+
+def wait_for(condition: Callable[[], bool], timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
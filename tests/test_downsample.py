@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from app.core.accumulation.zones import ZONE_STATS_DTYPE
+from app.core.downsample import lttb_indices, max_buckets
+from app.core.render import ZonesChart
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_lttb_keeps_endpoints_and_forced_indices(seed):
+    rng = np.random.default_rng(seed)
+    x = np.arange(5000, dtype=np.float64)
+    y = np.sin(x / 50) + rng.random(5000)
+    keep = rng.integers(0, 5000, 20)
+
+    selected = lttb_indices(x, y, 500, keep=keep)
+
+    assert selected[0] == 0 and selected[-1] == 4999
+    assert set(keep.tolist()) <= set(selected.tolist())
+    assert np.all(np.diff(selected) > 0)
+    assert 500 <= len(selected) <= 520
+
+
+def test_lttb_passes_short_series_through():
+    y = np.random.default_rng(0).random(300)
+    assert np.array_equal(lttb_indices(np.arange(300), y, 300), np.arange(300))
+    assert np.array_equal(lttb_indices(np.arange(300), y, 6000), np.arange(300))
+
+
+def test_max_buckets_keeps_spikes():
+    values = np.random.default_rng(1).random(5000)
+    values[1234] = 50.0
+    edges, maxima = max_buckets(values, 200)
+    assert len(edges) == 201 and edges[0] == 0 and edges[-1] == 5000
+    assert np.array_equal(maxima, [values[a:b].max() for a, b in zip(edges[:-1], edges[1:])])
+
+    edges, maxima = max_buckets(values[:100], 200)
+    assert np.array_equal(edges, np.arange(101)) and np.array_equal(maxima, values[:100])
+
+
+def zone_panel(seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    length = 20000
+    closes = 100 + np.cumsum(rng.normal(0, 1, length))
+    zone = np.zeros(1, dtype=ZONE_STATS_DTYPE)
+    zone['start_idx'], zone['end_idx'] = 1000, 1040
+    zone['min_price'], zone['max_price'] = closes[1000:1040].min(), closes[1000:1040].max()
+    zone['forecast_price'] = closes[1000:1040].mean()
+    return dict(
+        label='1m',
+        starts=1.7e12 + 60_000 * np.arange(length),
+        closes=closes,
+        volumes=rng.random(length) * 100,
+        forecast_multiplier=0.5,
+        accumulation=zone,
+        distribution=zone[:0],
+        price_points=100,
+        volume_bars=50,
+    )
+
+
+def test_zone_chart_keeps_zone_and_global_extremes():
+    chart = ZonesChart(1)
+    # На части этих рядов LTTB сам по себе теряет глобальный максимум или минимум
+    for seed in range(10):
+        panel = zone_panel(seed)
+        closes = panel['closes']
+        chart.update([panel])
+        shown = np.asarray(chart.rows[0]['line'].get_ydata())
+
+        assert len(shown) < 120
+        assert shown.max() == closes.max() and shown.min() == closes.min(), seed
+        assert closes[1000:1040].max() in shown and closes[1000:1040].min() in shown
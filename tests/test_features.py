@@ -0,0 +1,52 @@
+import numpy as np
+
+from API.ByBit.kline import Klines
+from app.core.accumulation.zones import ZoneSeries, find_accumulation_and_distribution
+from app.core.trend.indicators.rolling import rolling_atr, rolling_linregress, true_range
+from app.core.trend.indicators.trend_analysis import analyze_market_current_trend
+from tests.candles import random_frame
+from utils.time import ms_to_dt_obj
+
+
+def test_features_match_direct_computation():
+    frame = random_frame(0)
+    features = Klines.from_frame('BTCUSDT', 1, frame).features
+
+    for window_size in (20, 40):
+        expected = rolling_linregress(frame.close, window_size)
+        for actual, column in zip(features.regression(window_size), expected):
+            np.testing.assert_allclose(actual, column, rtol=1e-12, atol=1e-9)
+        np.testing.assert_allclose(
+            features.atr(window_size),
+            rolling_atr(true_range(frame.high, frame.low, frame.close), window_size),
+            rtol=1e-12,
+        )
+    assert features.times == [ms_to_dt_obj(int(start)) for start in frame.start]
+    assert features.zone_series.find_zones() == ZoneSeries(frame.close, frame.volume).find_zones()
+
+
+def test_features_are_computed_once():
+    klines = Klines.from_frame('BTCUSDT', 1, random_frame(1))
+    features = klines.features
+    assert klines.features is features
+    assert features.regression(40) is features.regression(40)
+    assert features.atr(40) is features.atr(40)
+    assert features.zone_series is features.zone_series
+
+
+def test_replaced_frame_gets_fresh_features():
+    frame = random_frame(2)
+    klines = Klines.from_frame('BTCUSDT', 1, frame[:-10])
+    stale = klines.features
+    trend = analyze_market_current_trend(klines)
+
+    klines._set_frame(frame[:-5])
+    assert klines.features is not stale
+    assert len(klines.features.regression(40)[0]) == len(frame) - 5 - 39
+
+    # Прямое присваивание frame тоже сбрасывает кэш
+    klines.frame = frame
+    assert klines.features.frame is frame
+    assert analyze_market_current_trend(klines) == analyze_market_current_trend(Klines.from_frame('BTCUSDT', 1, frame))
+    assert analyze_market_current_trend(klines) != trend
+    assert find_accumulation_and_distribution(klines) == ZoneSeries(frame.close, frame.volume).find_zones()
@@ -0,0 +1,156 @@
+from contextlib import contextmanager
+
+import numpy as np
+
+from app.core.feed import KlineFeed
+from app.core.frame import CandleFrame
+from app.core.timeframes import get_timeframe
+from tests.feed_replay import DATA_DIR, FakeBybitServer, load_frames, wait_for
+
+SYMBOL = 'BTCUSDT'
+INTERVALS = [1, 15]
+FRAMES = load_frames(DATA_DIR / 'kline_frames.jsonl')
+FIRST_START = FRAMES[0]['data'][0]['start']
+
+
+def history(interval: int, length: int, end: int = FIRST_START) -> CandleFrame:
+    """
+    length свечей вплотную до end (по умолчанию - до первой свечи записи)
+    """
+    start = end - interval * 60_000 * np.arange(length, 0, -1)
+    close = 65000.0 + np.arange(length)
+    return CandleFrame(start, close, close + 5, close - 5, close, np.ones(length), close)
+
+
+class ReplayFeed(KlineFeed):
+    """
+    История из памяти вместо REST.
+    fail_history - таймфреймы с ошибкой загрузки,
+    stale_history - таймфреймы, первая загрузка которых отстает от потока на свечу,
+    history_gate - загрузка ждет событие и включает первую свечу записи в неполном виде
+    """
+
+    def __init__(self, *args, fail_history=(), stale_history=(), history_gate=None, **kwargs):
+        super().__init__(*args, reconnect_delay=0.01, **kwargs)
+        self.fail_history = set(fail_history)
+        self.stale_history = set(stale_history)
+        self.history_gate = history_gate
+        self.gate_passed = []
+        self.loads = {interval: 0 for interval in self.intervals}
+
+    def _load_history(self, interval: int) -> CandleFrame:
+        self.loads[interval] += 1
+        step = interval * 60_000
+        if interval in self.fail_history:
+            raise ConnectionError('REST недоступен')
+        if interval in self.stale_history and self.loads[interval] == 1:
+            return history(interval, self.rings[interval].capacity, end=FIRST_START - step)
+        if self.history_gate is not None:
+            self.gate_passed.append(self.history_gate.wait(5))
+            return history(interval, self.rings[interval].capacity, end=FIRST_START + step)
+        return history(interval, self.rings[interval].capacity)
+
+
+def last_updates(interval: int) -> dict:
+    """
+    start -> последнее состояние свечи в записи
+    """
+    candles = {}
+    for frame in FRAMES:
+        if frame['topic'] == f'kline.{interval}.{SYMBOL}':
+            for candle in frame['data']:
+                candles[candle['start']] = candle
+    return candles
+
+
+@contextmanager
+def replaying(feed_factory):
+    """
+    Поток, подключенный к серверу записи, после обработки всех сообщений
+    """
+    with FakeBybitServer(FRAMES) as server:
+        feed = feed_factory(server)
+        feed.start()
+        try:
+            assert server.replayed.wait(5)
+            expected = {interval: max(last_updates(interval)) for interval in INTERVALS}
+            # Последнее сообщение по свече могло прийти позже, чем сменился start
+            assert wait_for(lambda: all(
+                len(feed.rings[interval])
+                and feed.rings[interval].last_start == start
+                and feed.rings[interval].to_frame().close[-1] == float(last_updates(interval)[start]['close'])
+                for interval, start in expected.items()
+            ))
+            yield feed, server
+        finally:
+            feed.stop()
+
+
+def test_capacity_follows_timeframe_registry():
+    feed = KlineFeed(SYMBOL, INTERVALS, url='ws://127.0.0.1:1')
+    for interval in INTERVALS:
+        assert feed.rings[interval].capacity == get_timeframe(interval).lookback
+
+
+def test_replay_updates_open_candle_and_appends_new():
+    with replaying(lambda server: ReplayFeed(SYMBOL, INTERVALS, url=server.url)) as (feed, server):
+        assert server.subscriptions == [feed.topics]
+        assert all(feed.is_ready(interval) for interval in INTERVALS)
+        frames = {interval: feed.get_klines(interval).frame for interval in INTERVALS}
+
+    for interval, frame in frames.items():
+        streamed = last_updates(interval)
+        assert len(frame) == feed.rings[interval].capacity
+        # Каждая свеча из потока ровно один раз, в последнем состоянии
+        tail = frame[-len(streamed):]
+        assert list(tail.start) == sorted(streamed)
+        for i, start in enumerate(sorted(streamed)):
+            assert tail.close[i] == float(streamed[start]['close'])
+            assert tail.volume[i] == float(streamed[start]['volume'])
+        assert np.all(np.diff(frame.start) == interval * 60_000)
+
+
+def test_failed_history_keeps_feed_unready():
+    with replaying(lambda server: ReplayFeed(SYMBOL, INTERVALS, url=server.url, fail_history=[15])) as (feed, _):
+        assert feed.is_ready(1)
+        # Свечи из потока есть, но истории нет: get_klines должен уйти в REST
+        assert len(feed.rings[15]) > 0
+        assert not feed.is_ready(15)
+        assert feed.get_klines(15) is None
+
+
+def test_without_seed_ready_only_when_buffer_is_full():
+    with replaying(lambda server: KlineFeed(SYMBOL, INTERVALS, url=server.url, seed=False)) as (feed, _):
+        assert not feed.is_ready(1)
+
+    with replaying(lambda server: KlineFeed(SYMBOL, INTERVALS, capacity=3, url=server.url, seed=False)) as (feed, _):
+        # Буфер 1m заполнен потоком, но свечей меньше окна анализа
+        assert len(feed.rings[1]) == 3
+        assert not feed.is_ready(1)
+        feed.min_length[1] = 3
+        assert feed.is_ready(1)
+
+
+def test_history_loaded_after_subscription():
+    # Свеча из истории неполная: ее закрытие приходит в потоке, пока грузится история
+    def factory(server):
+        return ReplayFeed(SYMBOL, INTERVALS, url=server.url, history_gate=server.replayed)
+
+    with replaying(factory) as (feed, _):
+        assert feed.gate_passed == [True, True]
+        frames = {interval: feed.get_klines(interval).frame for interval in INTERVALS}
+
+    for interval, frame in frames.items():
+        first = int(np.searchsorted(frame.start, FIRST_START))
+        assert frame.close[first] == float(last_updates(interval)[FIRST_START]['close'])
+        assert np.all(np.diff(frame.start) == interval * 60_000)
+
+
+def test_stale_history_is_reloaded():
+    with replaying(lambda server: ReplayFeed(SYMBOL, INTERVALS, url=server.url, stale_history=[1])) as (feed, _):
+        assert wait_for(lambda: feed.is_ready(1))
+        frame = feed.get_klines(1).frame
+
+    assert feed.loads[1] == 2
+    assert np.all(np.diff(frame.start) == 60_000)
+    assert list(frame.start[-len(last_updates(1)):]) == sorted(last_updates(1))
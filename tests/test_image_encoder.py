@@ -0,0 +1,60 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from app.core.image_encoder import ImageEncoder
+from app.core.render import ZonesChart
+from tests.test_downsample import zone_panel
+
+
+@pytest.fixture(scope='module')
+def chart_image() -> Image.Image:
+    return ZonesChart(1).snapshot([zone_panel(0)])
+
+
+def decode(data: bytes) -> Image.Image:
+    image = Image.open(BytesIO(data))
+    image.load()
+    return image
+
+
+@pytest.mark.parametrize('image_format, pil_format', [('png', 'PNG'), ('jpeg', 'JPEG'), ('webp', 'WEBP')])
+def test_encoded_format_matches_declared_type(chart_image, image_format, pil_format):
+    encoder = ImageEncoder(image_format, max_side=1000)
+    image = decode(encoder.encode(chart_image))
+
+    assert image.format == pil_format
+    assert encoder.content_type == Image.MIME[pil_format]
+    assert max(image.size) == 1000
+    # Пропорции сохраняются
+    assert image.size[0] / image.size[1] == pytest.approx(chart_image.size[0] / chart_image.size[1], rel=0.01)
+
+
+@pytest.mark.parametrize('image_format', ['png', 'jpeg', 'webp'])
+@pytest.mark.parametrize('max_bytes', [150_000, 60_000])
+def test_encoded_size_fits_budget(chart_image, image_format, max_bytes):
+    data = ImageEncoder(image_format, max_bytes=max_bytes, max_side=2048).encode(chart_image)
+    assert len(data) <= max_bytes
+    assert min(decode(data).size) >= ImageEncoder.MIN_SIDE
+
+
+def test_unreachable_budget_stops_at_min_side(chart_image):
+    # Меньше MIN_SIDE график не уменьшается, даже если не уложился в размер
+    encoder = ImageEncoder('jpeg', max_bytes=5_000, max_side=2048)
+    data = encoder.encode(chart_image)
+    side = min(decode(data).size)
+    assert ImageEncoder.MIN_SIDE <= side < ImageEncoder.MIN_SIDE / ImageEncoder.SCALE_STEP
+    assert len(data) > encoder.max_bytes
+
+
+def test_budget_keeps_full_size_when_it_fits(chart_image):
+    unbounded = ImageEncoder('jpeg').encode(chart_image)
+    data = ImageEncoder('jpeg', max_bytes=len(unbounded)).encode(chart_image)
+    assert data == unbounded
+    assert decode(data).size == chart_image.size
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        ImageEncoder('gif')
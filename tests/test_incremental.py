@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from API.ByBit.kline import Klines
+from app.core.trend.indicators.incremental import IncrementalTrendAnalyzer
+from app.core.trend.indicators.trend_analysis import analyze_market_current_trend
+from tests.candles import random_frame
+
+
+def assert_same_trend(snapshot: dict, expected: dict):
+    assert snapshot['trend'] == expected['trend']
+    for key in ('strength', 'slope', 'atr', 'reversal_level'):
+        assert snapshot[key] == pytest.approx(expected[key], rel=1e-9, abs=1e-7), key
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_streaming_matches_batch_analysis(seed):
+    frame = random_frame(seed, length=600)
+    rng = np.random.default_rng(seed)
+    analyzer = IncrementalTrendAnalyzer(slope_threshold=0.5)
+
+    for i in range(len(frame)):
+        start = int(frame.start[i])
+        # Незакрытая свеча несколько раз обновляется, прежде чем принять итоговые значения
+        for _ in range(2):
+            analyzer.push(start, frame.high[i] + 5, frame.low[i] - 5, frame.close[i] + rng.normal(0, 3))
+        analyzer.push(start, frame.high[i], frame.low[i], frame.close[i])
+
+        if i < 39:
+            assert analyzer.snapshot() is None
+        elif i % 7 == 0:
+            window = Klines.from_frame('BTCUSDT', 1, frame[max(i - 99, 0):i + 1])
+            assert_same_trend(analyzer.snapshot(), analyze_market_current_trend(window, slope_threshold=0.5))
+
+
+def test_from_klines_matches_batch_analysis():
+    klines = Klines.from_frame('BTCUSDT', 1, random_frame(5, length=1000))
+    assert_same_trend(
+        IncrementalTrendAnalyzer.from_klines(klines).snapshot(),
+        analyze_market_current_trend(klines),
+    )
@@ -0,0 +1,63 @@
+import threading
+
+import app.core.klines as klines_module
+from app.core.cache import klines_cache
+from app.core.timeframes import intervals as timeframe_intervals
+from conf.settings import settings
+
+
+class FlakyFeed:
+    """
+    Поток, который становится неготовым после первого таймфрейма
+    """
+    symbol = settings.SYMBOL
+
+    def __init__(self):
+        self.calls = []
+
+    def is_ready(self, interval: int) -> bool:
+        return True
+
+    def get_klines(self, interval: int):
+        self.calls.append(interval)
+        return 'feed' if len(self.calls) == 1 else None
+
+
+def test_feed_dropping_mid_request_falls_back_to_rest(monkeypatch):
+    intervals = timeframe_intervals()
+    feed = FlakyFeed()
+    monkeypatch.setattr(settings, 'KLINES_RESAMPLE', False)
+    monkeypatch.setattr(settings, 'KLINES_CACHE_ENABLED', False)
+    monkeypatch.setattr(klines_module, 'get_feed', lambda: feed)
+    monkeypatch.setattr(
+        klines_module, 'fetch_klines',
+        lambda symbol, intervals: ({interval: f'rest {interval}' for interval in intervals}, {}),
+    )
+
+    assert klines_module.get_klines() == tuple(f'rest {interval}' for interval in intervals)
+    assert feed.calls == intervals
+
+
+def test_timed_out_load_is_not_shared_through_cache(monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def loader(**kwargs):
+        calls.append(kwargs['interval'])
+        if len(calls) == 1:
+            # Первая загрузка зависает дольше таймаута
+            release.wait(5)
+        return f'loaded {len(calls)}'
+
+    monkeypatch.setattr(settings, 'KLINES_CACHE_ENABLED', True)
+    monkeypatch.setattr(klines_module, 'Klines', loader)
+    klines_cache.clear()
+    try:
+        results, errors = klines_module.fetch_klines('CACHETEST', [1], timeout=0.2)
+        assert results == {} and isinstance(errors[1], TimeoutError)
+
+        results, errors = klines_module.fetch_klines('CACHETEST', [1], timeout=2)
+        assert results == {1: 'loaded 2'} and errors == {}
+    finally:
+        release.set()
+        klines_cache.clear()
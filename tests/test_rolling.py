@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from app.core.trend.indicators.rolling import (
+    rolling_atr,
+    rolling_linregress,
+    rolling_std,
+    true_range,
+)
+from tests.candles import random_frame
+
+
+def reference_window_features(closes, highs, lows, window_size):
+    """
+    Исходный расчет фичей: LinearRegression и true range по каждому окну в цикле
+    """
+    features = []
+    for start in range(len(closes) - window_size + 1):
+        end = start + window_size
+        c_window = closes[start:end]
+        h_window = highs[start:end]
+        l_window = lows[start:end]
+        t = np.arange(window_size).reshape(-1, 1)
+
+        lr = LinearRegression().fit(t, c_window)
+        slope = lr.coef_[0]
+        r2 = lr.score(t, c_window)
+
+        tr = np.maximum(h_window[1:] - l_window[1:],
+                        np.maximum(np.abs(h_window[1:] - c_window[:-1]),
+                                   np.abs(l_window[1:] - c_window[:-1])))
+        atr = np.mean(tr)
+        features.append([slope, lr.intercept_, r2, atr])
+    return np.array(features)
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('window_size', [10, 40])
+def test_rolling_features_match_sklearn_loop(seed, window_size):
+    frame = random_frame(seed, length=300)
+    expected = reference_window_features(frame.close, frame.high, frame.low, window_size)
+
+    slope, intercept, r2 = rolling_linregress(frame.close, window_size)
+    atr = rolling_atr(true_range(frame.high, frame.low, frame.close), window_size)
+
+    np.testing.assert_allclose(slope, expected[:, 0], rtol=0, atol=1e-8)
+    np.testing.assert_allclose(intercept, expected[:, 1], rtol=1e-12, atol=1e-6)
+    np.testing.assert_allclose(atr, expected[:, 3], rtol=1e-12, atol=1e-9)
+
+    # Для окна без изменения цены LinearRegression.score дает 0 или 1 в зависимости
+    # от ошибки округления прогноза, закрытая форма всегда дает 1
+    flat = np.array([np.ptp(frame.close[i:i + window_size]) == 0 for i in range(len(r2))])
+    assert flat.any()
+    assert np.all(r2[flat] == 1.0)
+    assert np.all(np.isin(expected[flat, 2], [0.0, 1.0]))
+    np.testing.assert_allclose(r2[~flat], expected[~flat, 2], rtol=0, atol=1e-8)
+
+
+def test_rolling_std_matches_numpy():
+    closes = random_frame(7, length=300).close
+    expected = [np.std(closes[i:i + 20]) for i in range(len(closes) - 19)]
+    np.testing.assert_allclose(rolling_std(closes, 20), expected, rtol=1e-9, atol=1e-9)
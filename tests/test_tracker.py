@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from app.core.accumulation.tracker import (
+    ACCUMULATION_OPENED,
+    DISTRIBUTION,
+    ZONE_CANCELLED,
+    ZoneTracker,
+)
+from app.core.accumulation.zones import ZoneSeries
+from tests.test_zones import random_series
+
+PARAMS = [
+    dict(window_size=20, price_std_threshold=0.005, breakout_multiplier=1.5),
+    dict(window_size=10, price_std_threshold=0.001, breakout_multiplier=8.0),
+]
+
+
+def batch_zones(closes, volumes, avg_volume, params):
+    series = ZoneSeries(closes, volumes)
+    series.avg_volume = avg_volume
+    return series.find_zones(**params)
+
+
+def replay_events(events):
+    """
+    Списки зон, восстановленные только по событиям трекера
+    """
+    zones = {'accumulation': [], 'distribution': []}
+    for event in events:
+        zone = (event['start_idx'], event['end_idx'])
+        if event['type'] == ACCUMULATION_OPENED:
+            zones['accumulation'].append(zone)
+        elif event['type'] == DISTRIBUTION:
+            zones['distribution'].append(zone)
+        elif event['type'] == ZONE_CANCELLED:
+            zones[event['zone_type']].remove(zone)
+    return zones['accumulation'], zones['distribution']
+
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('params', PARAMS)
+def test_tracker_matches_batch_scan(seed, params):
+    closes, volumes = random_series(seed)
+    avg_volume = float(np.mean(volumes))
+    tracker = ZoneTracker(avg_volume=avg_volume, **params)
+    events = []
+    tracker.listeners.append(events.append)
+
+    for n, (close, volume) in enumerate(zip(closes, volumes), start=1):
+        tracker.push(60_000 * n, float(close), float(volume))
+        if n % 97 == 0 or n == len(closes):
+            expected = batch_zones(closes[:n], volumes[:n], avg_volume, params)
+            assert (tracker.accumulation_zones, tracker.distribution_zones) == expected
+    assert replay_events(events) == (tracker.accumulation_zones, tracker.distribution_zones)
+
+
+def test_tracker_keeps_scanning_without_breakout():
+    # Спокойный рынок с высоким объемом, затем снова: breakout так и не наступает
+    rng = np.random.default_rng(1)
+    closes = 100 + np.concatenate([
+        rng.normal(0, 0.01, 30), rng.normal(0, 0.3, 40), rng.normal(0, 0.01, 30), rng.normal(0, 0.01, 5),
+    ])
+    volumes = np.concatenate([np.full(30, 300.0), np.full(40, 50.0), np.full(30, 300.0), np.full(5, 50.0)])
+    params = dict(window_size=20, price_std_threshold=0.005, breakout_multiplier=1000.0)
+
+    tracker = ZoneTracker(avg_volume=float(volumes.mean()), **params)
+    for n, (close, volume) in enumerate(zip(closes, volumes)):
+        tracker.push(n, float(close), float(volume))
+
+    assert len(tracker.accumulation_zones) >= 2
+    assert tracker.distribution_zones == []
+    assert tracker.open_zone == tracker.accumulation_zones[0]
+    assert (tracker.accumulation_zones, tracker.distribution_zones) == \
+        batch_zones(closes, volumes, float(volumes.mean()), params)
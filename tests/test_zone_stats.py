@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from app.core.accumulation.zones import ZoneStatsIndex, calculate_zone_stats
+
+
+def reference_zone_stats(closes, volumes, zones):
+    """
+    Исходный расчет статистики по каждой зоне в цикле плюс границы
+    прямоугольника, которые раньше брал график
+    """
+    stats = []
+    for start, end in zones:
+        avg_price = np.mean(closes[start:end])
+        sum_volume = np.sum(volumes[start:end])
+        # Прогноз через взвешенное изменение
+        if sum_volume > 0:
+            weight = volumes[start:end] / sum_volume
+            forecast_price = avg_price + np.sum((closes[start:end] - avg_price) * weight)
+        else:
+            forecast_price = avg_price
+        stats.append((avg_price, sum_volume, forecast_price, min(closes[start:end]), max(closes[start:end])))
+    return np.array(stats)
+
+
+def random_zones(seed: int):
+    rng = np.random.default_rng(seed)
+    length = int(rng.integers(30, 3000))
+    closes = 30000 + np.cumsum(rng.normal(0, 20, length))
+    volumes = rng.uniform(0, 5, length)
+    # Зоны без объема: прогноз равен средней цене
+    volumes[rng.random(length) < 0.3] = 0
+    starts = rng.integers(0, length - 1, 200)
+    ends = np.minimum(starts + rng.integers(1, 100, 200), length)
+    return closes, volumes, list(zip(starts.tolist(), ends.tolist()))
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_zone_stats_match_per_zone_loop(seed):
+    closes, volumes, zones = random_zones(seed)
+    expected = reference_zone_stats(closes, volumes, zones)
+
+    table = ZoneStatsIndex(closes, volumes).stats(zones)
+    actual = np.stack([table[name] for name in ('avg_price', 'sum_volume', 'forecast_price', 'min_price', 'max_price')], 1)
+
+    assert list(zip(table['start_idx'].tolist(), table['end_idx'].tolist())) == zones
+    np.testing.assert_allclose(actual, expected, rtol=1e-11, atol=1e-9)
+
+
+def test_zone_stats_dicts_keep_format():
+    closes, volumes, zones = random_zones(0)
+    stats = calculate_zone_stats(closes, volumes, zones[:5])
+    assert [set(row) for row in stats] == [{'start_idx', 'end_idx', 'avg_price', 'sum_volume', 'forecast_price'}] * 5
+    assert all(type(row['start_idx']) is int and isinstance(row['avg_price'], float) for row in stats)
+    assert calculate_zone_stats(closes, volumes, []) == []
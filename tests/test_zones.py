@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from app.core.accumulation.zones import ZoneSeries
+
+
+def reference_find_zones(closes, volumes, window_size=20, price_std_threshold=0.005,
+                         volume_multiplier=1.2, breakout_multiplier=1.5):
+    """
+    Исходный поиск зон: полный пересчет каждого окна в цикле
+    """
+    avg_volume = np.mean(volumes)
+
+    accumulation_zones = []
+    distribution_zones = []
+
+    i = 0
+    while i < len(closes) - window_size:
+        window = closes[i:i+window_size]
+        window_vol = volumes[i:i+window_size]
+        std_price = np.std(window) / np.mean(window)
+        mean_vol = np.mean(window_vol)
+
+        if std_price < price_std_threshold and mean_vol > avg_volume * volume_multiplier:
+            accumulation_zones.append((i, i+window_size))
+
+            future_prices = closes[i+window_size:]
+            diffs = np.abs(np.diff(future_prices))
+            threshold = np.std(window) * breakout_multiplier
+            breakout_idx = np.where(diffs > threshold)[0]
+            if len(breakout_idx) > 0:
+                distribution_zones.append((i, i+window_size+breakout_idx[0]+1))
+                i += window_size + breakout_idx[0] + 1
+            else:
+                i += window_size
+        else:
+            i += 1
+
+    return accumulation_zones, distribution_zones
+
+
+def random_series(seed: int, length: int = 1000):
+    """
+    Случайное блуждание со спокойными участками повышенного объема
+    """
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0, 0.004, length)
+    volumes = rng.uniform(50, 100, length)
+    position = int(rng.integers(0, 40))
+    while position < length:
+        calm = int(rng.integers(20, 90))
+        returns[position:position + calm] = rng.normal(0, 0.0003, len(returns[position:position + calm]))
+        volumes[position:position + calm] *= rng.uniform(1.5, 4)
+        position += calm + int(rng.integers(20, 200))
+    closes = 65000 * np.exp(np.cumsum(returns))
+    return closes, volumes
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_find_zones_matches_reference_scan(seed):
+    closes, volumes = random_series(seed)
+    series = ZoneSeries(closes, volumes)
+    found = 0
+    for window_size, threshold, breakout in [(20, 0.005, 1.5), (20, 0.002, 3.0), (40, 0.003, 1.5), (10, 0.001, 8.0)]:
+        expected = reference_find_zones(
+            closes, volumes,
+            window_size=window_size, price_std_threshold=threshold, breakout_multiplier=breakout,
+        )
+        actual = series.find_zones(
+            window_size=window_size, price_std_threshold=threshold, breakout_multiplier=breakout,
+        )
+        assert [list(zones) for zones in actual] == [list(zones) for zones in expected]
+        found += len(expected[0])
+    assert found > 0
+
+
+def test_find_zones_short_series():
+    closes, volumes = random_series(0, length=15)
+    assert ZoneSeries(closes, volumes).find_zones(window_size=20) == ([], [])
+    assert reference_find_zones(closes, volumes, window_size=20) == ([], [])
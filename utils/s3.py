@@ -10,11 +10,13 @@ load_dotenv()
 def upload_image(
         file_name: str,
         buf: bytes,
+        extension: str = 'jpg',
+        content_type: str = 'image/jpeg',
 ):
-    Key = f'media/{file_name}.jpg'
+    Key = f'media/{file_name}.{extension}'
     res = settings.s3_client.Bucket(settings.AWS_STORAGE_BUCKET_NAME).put_object(
         Key=Key,
         Body=buf,
-        ContentType='image/jpeg'
+        ContentType=content_type
     )
     return settings.S3_URL + Key